@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.middleware.profiling import MODES, make_token
+
+
+class Command(BaseCommand):
+    help = 'Выдаёт подписанное значение заголовка X-Profile для пути'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--mode', choices=MODES, default='trace')
+
+    def handle(self, *args, **options):
+        self.stdout.write(make_token(options['path'], options['mode']))
@@ -0,0 +1,233 @@
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+METRICS = {
+    'yatube_http_requests_total': (
+        'counter', 'Обработанные запросы по представлению и статусу.'
+    ),
+    'yatube_view_duration_seconds': (
+        'histogram', 'Время ответа представления.'
+    ),
+    'yatube_view_db_queries_total': (
+        'counter', 'SQL-запросы, выполненные представлением.'
+    ),
+    'yatube_view_db_seconds_total': (
+        'counter', 'Время SQL-запросов представления.'
+    ),
+    'yatube_template_render_seconds': (
+        'histogram', 'Время рендеринга шаблона.'
+    ),
+    'yatube_cache_requests_total': (
+        'counter', 'Обращения к кэшам по результату.'
+    ),
+    'yatube_upload_bytes_total': (
+        'counter', 'Байты загруженных изображений.'
+    ),
+}
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    """Метрики процесса, сбрасываемые в свой файл в METRICS_DIR.
+
+    Каждый воркер пишет только `<pid>.json`, а /metrics суммирует файлы
+    живых воркеров, поэтому общая память между процессами не нужна.
+    Без METRICS_DIR метрики видны только в текущем процессе.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.counters = {}
+        self.histograms = {}
+        self.flushed_at = 0
+        self.dirty = False
+
+    def inc(self, name, value=1, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self.dirty = True
+
+    def observe(self, name, value, **labels):
+        key = (name, label_key(labels))
+        index = bisect_left(DEFAULT_BUCKETS, value)
+        with self.lock:
+            buckets, total = self.histograms.get(
+                key, ([0] * (len(DEFAULT_BUCKETS) + 1), 0)
+            )
+            buckets[index] += 1
+            self.histograms[key] = buckets, total + value
+            self.dirty = True
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [
+                    [name, dict(labels), value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                'histograms': [
+                    [name, dict(labels), list(buckets), total]
+                    for (name, labels), (buckets, total)
+                    in self.histograms.items()
+                ],
+            }
+
+    def path(self):
+        return os.path.join(settings.METRICS_DIR, f'{self.pid}.json')
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        interval = 0 if force else settings.METRICS_FLUSH_INTERVAL
+        if (
+            not settings.METRICS_DIR or not self.dirty
+            or now - self.flushed_at < interval
+        ):
+            return
+        self.dirty = False
+        self.flushed_at = now
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = self.path()
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temporary, path)
+
+
+registry = Registry()
+os.register_at_fork(after_in_child=registry.reset)
+
+inc = registry.inc
+observe = registry.observe
+
+
+def count_lookup(cache, hit, count=1):
+    if count:
+        inc(
+            'yatube_cache_requests_total', count,
+            cache=cache, result='hit' if hit else 'miss'
+        )
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def lookup_counts(cache):
+    counters, _ = collect()
+    return tuple(
+        counters.get((
+            'yatube_cache_requests_total',
+            label_key({'cache': cache, 'result': result})
+        ), 0)
+        for result in ('hit', 'miss')
+    )
+
+
+def read_snapshots():
+    if not settings.METRICS_DIR:
+        yield registry.snapshot()
+        return
+    registry.flush(force=True)
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        pid = os.path.splitext(os.path.basename(path))[0]
+        try:
+            if not process_alive(int(pid)):
+                os.remove(path)
+                continue
+            with open(path, encoding='utf-8') as f:
+                yield json.load(f)
+        except (OSError, ValueError):
+            continue
+
+
+def collect():
+    counters = {}
+    histograms = {}
+    for snapshot in read_snapshots():
+        for name, labels, value in snapshot['counters']:
+            key = (name, label_key(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total in snapshot['histograms']:
+            key = (name, label_key(labels))
+            merged, merged_total = histograms.get(
+                key, ([0] * len(buckets), 0)
+            )
+            histograms[key] = (
+                [a + b for a, b in zip(merged, buckets)], merged_total + total
+            )
+    return counters, histograms
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('\n', '\\n')
+        .replace('"', '\\"')
+    )
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+    return '{' + pairs + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def histogram_lines(name, labels, buckets, total):
+    cumulative = 0
+    bounds = [*map(repr, DEFAULT_BUCKETS), '+Inf']
+    for bound, count in zip(bounds, buckets):
+        cumulative += count
+        bucket_labels = format_labels((*labels, ('le', bound)))
+        yield f'{name}_bucket{bucket_labels} {cumulative}'
+    yield f'{name}_sum{format_labels(labels)} {format_value(total)}'
+    yield f'{name}_count{format_labels(labels)} {cumulative}'
+
+
+def exposition():
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        samples = counters if kind == 'counter' else histograms
+        keys = sorted(key for key in samples if key[0] == name)
+        if not keys:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for key in keys:
+            labels = key[1]
+            if kind == 'counter':
+                lines.append(
+                    f'{name}{format_labels(labels)} '
+                    f'{format_value(samples[key])}'
+                )
+            else:
+                lines.extend(histogram_lines(name, labels, *samples[key]))
+    return '\n'.join(lines) + '\n'
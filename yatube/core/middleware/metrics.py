@@ -0,0 +1,81 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+from django.urls import Resolver404, resolve
+
+from .. import metrics
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return 'not_found'
+    return match.view_name
+
+
+def timed_render(render):
+    def wrapper(self, context):
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            metrics.observe(
+                'yatube_template_render_seconds',
+                time.perf_counter() - start,
+                template=self.origin.template_name or self.name or '<string>'
+            )
+    wrapper.timed = True
+    return wrapper
+
+
+def install_template_timer():
+    if not getattr(Template.render, 'timed', False):
+        Template.render = timed_render(Template.render)
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install_template_timer()
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        view = view_label(request)
+        metrics.inc(
+            'yatube_http_requests_total',
+            view=view, method=request.method, status=response.status_code
+        )
+        metrics.observe('yatube_view_duration_seconds', duration, view=view)
+        metrics.inc('yatube_view_db_queries_total', timer.count, view=view)
+        metrics.inc('yatube_view_db_seconds_total', timer.duration, view=view)
+        metrics.registry.flush()
+        return response
@@ -0,0 +1,262 @@
+import contextvars
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.template.base import Template
+from django.utils import timezone
+from django.utils.text import slugify
+
+SIGNING_SALT = 'core.profiling'
+MODES = ('trace', 'sample')
+
+_current = contextvars.ContextVar('profile', default=None)
+
+
+def make_token(path, mode='trace'):
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(f'{mode}:{path}')
+
+
+def header_mode(request):
+    token = request.META.get(settings.PROFILING_HEADER)
+    if not token:
+        return None
+    try:
+        value = signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+            token, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+    mode, _, path = value.partition(':')
+    if mode not in MODES or path != request.path:
+        return None
+    return mode
+
+
+def param_mode(request):
+    value = request.GET.get(settings.PROFILING_QUERY_PARAM)
+    if value is None or not request.user.is_staff:
+        return None
+    return value if value in MODES else 'trace'
+
+
+def call_site():
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(settings.BASE_DIR)
+            and 'site-packages' not in filename
+            and filename != __file__
+        ):
+            path = os.path.relpath(filename, settings.BASE_DIR)
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def folded_stack(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        filename = os.path.basename(code.co_filename)
+        names.append(f'{code.co_name} ({filename}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[folded_stack(frame)] += 1
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+
+class Profile:
+    def __init__(self, request, mode):
+        self.method = request.method
+        self.path = request.get_full_path()
+        self.mode = mode
+        self.started_at = timezone.now()
+        self.started = time.perf_counter()
+        self.duration = None
+        self.queries = []
+        self.templates = []
+        self.depth = 0
+        self.samples = Counter()
+
+    def elapsed(self, since=None):
+        return (time.perf_counter() - (since or self.started)) * 1000
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'alias': context['connection'].alias,
+                'start_ms': round((start - self.started) * 1000, 3),
+                'duration_ms': round(self.elapsed(start), 3),
+                'site': call_site(),
+            })
+
+    def render_template(self, render, template, context):
+        start = time.perf_counter()
+        self.depth += 1
+        try:
+            return render(template, context)
+        finally:
+            self.depth -= 1
+            self.templates.append({
+                'name': (
+                    template.origin.template_name or template.name
+                    or '<string>'
+                ),
+                'depth': self.depth,
+                'start_ms': round((start - self.started) * 1000, 3),
+                'duration_ms': round(self.elapsed(start), 3),
+            })
+
+    def trace_events(self):
+        events = [{
+            'name': f'{self.method} {self.path}', 'cat': 'request',
+            'ph': 'X', 'ts': 0, 'dur': self.duration * 1000,
+            'pid': os.getpid(), 'tid': 1,
+        }]
+        for category, spans, name in (
+            ('template', self.templates, 'name'),
+            ('sql', self.queries, 'sql'),
+        ):
+            events.extend({
+                'name': span[name], 'cat': category, 'ph': 'X',
+                'ts': span['start_ms'] * 1000,
+                'dur': span['duration_ms'] * 1000,
+                'pid': os.getpid(), 'tid': 1,
+            } for span in spans)
+        return events
+
+    def report(self, response):
+        return {
+            'method': self.method,
+            'path': self.path,
+            'status': response.status_code,
+            'mode': self.mode,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round(self.duration, 3),
+            'query_count': len(self.queries),
+            'query_time_ms': round(
+                sum(query['duration_ms'] for query in self.queries), 3
+            ),
+            'queries': self.queries,
+            'templates': sorted(
+                self.templates, key=lambda span: span['start_ms']
+            ),
+            'traceEvents': self.trace_events(),
+        }
+
+
+def report_name(profile):
+    stamp = profile.started_at.strftime('%Y%m%dT%H%M%S%f')
+    path = slugify(profile.path.split('?')[0]) or 'root'
+    return f'{stamp}-{path}-{os.getpid()}'
+
+
+def prune_reports():
+    reports = sorted(
+        glob.glob(os.path.join(settings.PROFILING_DIR, '*.json')),
+        key=os.path.getmtime
+    )
+    excess = len(reports) - settings.PROFILING_MAX_REPORTS
+    for path in reports[:max(excess, 0)]:
+        for name in (path, os.path.splitext(path)[0] + '.folded'):
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+
+
+def write_report(profile, response):
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    name = report_name(profile)
+    base = os.path.join(settings.PROFILING_DIR, name)
+    with open(base + '.json', 'w', encoding='utf-8') as file_:
+        json.dump(profile.report(response), file_, ensure_ascii=False)
+    if profile.samples:
+        with open(base + '.folded', 'w', encoding='utf-8') as file_:
+            for stack, count in profile.samples.most_common():
+                file_.write(f'{stack} {count}\n')
+    prune_reports()
+    return name
+
+
+def profiled_render(render):
+    def wrapper(self, context):
+        profile = _current.get()
+        if profile is None:
+            return render(self, context)
+        return profile.render_template(render, self, context)
+    wrapper.profiled = True
+    return wrapper
+
+
+def install_template_hook():
+    if not getattr(Template._render, 'profiled', False):
+        Template._render = profiled_render(Template._render)
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_template_hook()
+
+    def __call__(self, request):
+        mode = header_mode(request) or param_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        return self.profile(request, mode)
+
+    def profile(self, request, mode):
+        profile = Profile(request, mode)
+        sampler = None
+        if mode == 'sample':
+            sampler = Sampler(
+                threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL
+            )
+            sampler.start()
+        token = _current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(profile.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+            if sampler is not None:
+                sampler.stop()
+                profile.samples = sampler.stacks
+        profile.duration = profile.elapsed()
+        response['X-Profile-Report'] = write_report(profile, response)
+        return response
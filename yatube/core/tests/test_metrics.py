@@ -0,0 +1,166 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.images import ingest_image
+from posts.models import Group, Post
+
+from .. import metrics
+
+User = get_user_model()
+
+METRICS_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(METRICS_DIR=METRICS_DIR, METRICS_TOKEN='secret')
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.create(author=cls.user, group=group, text='Пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        metrics.registry.reset()
+        self.url = reverse('posts:main_page')
+
+    def exposition(self):
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        return response.content.decode()
+
+    def test_view_metrics(self):
+        """Запрос учитывается в счётчиках, гистограммах и SQL."""
+        self.client.get(self.url)
+        text = self.exposition()
+        self.assertIn(
+            'yatube_http_requests_total{method="GET",status="200",'
+            'view="posts:main_page"} 1', text
+        )
+        self.assertIn('# TYPE yatube_view_duration_seconds histogram', text)
+        self.assertIn(
+            'yatube_view_duration_seconds_bucket'
+            '{view="posts:main_page",le="+Inf"} 1', text
+        )
+        self.assertIn(
+            'yatube_view_db_queries_total{view="posts:main_page"}', text
+        )
+        self.assertIn(
+            'yatube_template_render_seconds_count'
+            '{template="posts/index.html"} 1', text
+        )
+
+    def test_cache_lookups(self):
+        """Попадания и промахи кэшей видны по типу кэша."""
+        self.client.get(self.url)
+        self.client.get(self.url)
+        text = self.exposition()
+        self.assertIn(
+            'yatube_cache_requests_total'
+            '{cache="anonymous_page",result="hit"} 1', text
+        )
+        for cache_name in ('anonymous_page', 'feed_page', 'post_card'):
+            self.assertIn(
+                'yatube_cache_requests_total'
+                f'{{cache="{cache_name}",result="miss"}}', text
+            )
+
+    def test_upload_bytes(self):
+        """Учитываются принятые и сохранённые байты загрузок."""
+        buffer = BytesIO()
+        Image.new('RGB', (40, 30), 'red').save(buffer, 'PNG')
+        ingested = ingest_image(
+            SimpleUploadedFile('red.png', buffer.getvalue(), 'image/png')
+        )
+        text = self.exposition()
+        self.assertIn(
+            'yatube_upload_bytes_total{stage="received"} '
+            f'{len(buffer.getvalue())}', text
+        )
+        self.assertIn(
+            f'yatube_upload_bytes_total{{stage="stored"}} {ingested.size}',
+            text
+        )
+
+    def write_worker(self, pid, requests):
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        other = {
+            'counters': [[
+                'yatube_http_requests_total',
+                {'method': 'GET', 'status': 200, 'view': 'posts:main_page'},
+                requests
+            ]],
+            'histograms': [],
+        }
+        path = os.path.join(METRICS_DIR, f'{pid}.json')
+        with open(path, 'w') as f:
+            json.dump(other, f)
+        return path
+
+    def test_worker_files_are_summed(self):
+        """Файлы других воркеров суммируются с текущим процессом."""
+        self.client.get(self.url)
+        self.write_worker(os.getppid(), 2)
+        self.assertIn(
+            'yatube_http_requests_total{method="GET",status="200",'
+            'view="posts:main_page"} 3', self.exposition()
+        )
+
+    def test_dead_worker_files_are_dropped(self):
+        """Файлы завершившихся воркеров не учитываются и удаляются."""
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        path = self.write_worker(process.pid, 5)
+        self.client.get(self.url)
+        self.assertIn(
+            'yatube_http_requests_total{method="GET",status="200",'
+            'view="posts:main_page"} 1', self.exposition()
+        )
+        self.assertFalse(os.path.exists(path))
+
+    @override_settings(METRICS_DIR=None)
+    def test_single_process_without_directory(self):
+        """Без каталога метрики отдаются из памяти и не пишутся."""
+        self.client.get(self.url)
+        self.assertIn(
+            'yatube_http_requests_total{method="GET",status="200",'
+            'view="posts:main_page"} 1', self.exposition()
+        )
+        self.assertFalse(os.path.exists(METRICS_DIR))
+
+    def test_access_requires_token_or_staff(self):
+        """Метрики доступны по токену или персоналу."""
+        url = reverse('metrics')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+        self.client.force_login(User.objects.create_user(
+            username='staff', is_staff=True
+        ))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
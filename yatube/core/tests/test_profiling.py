@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+from ..middleware.profiling import make_token
+
+User = get_user_model()
+
+PROFILING_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(PROFILING_DIR=PROFILING_DIR)
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.create(author=cls.user, group=group, text='Пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+        self.url = reverse('posts:main_page')
+
+    def report(self, response, extension='.json'):
+        name = response['X-Profile-Report'] + extension
+        with open(os.path.join(PROFILING_DIR, name), encoding='utf-8') as f:
+            return json.load(f) if extension == '.json' else f.read()
+
+    def test_disabled_by_default(self):
+        """Без заголовка и параметра профиль не пишется."""
+        response = self.client.get(self.url, {'_profile': '1'})
+        self.assertFalse(response.has_header('X-Profile-Report'))
+        self.assertFalse(os.path.exists(PROFILING_DIR))
+
+    def test_signed_header_writes_report(self):
+        """Подписанный заголовок включает запись SQL и шаблонов."""
+        response = self.client.get(
+            self.url, HTTP_X_PROFILE=make_token(self.url)
+        )
+        report = self.report(response)
+        self.assertEqual(report['path'], self.url)
+        self.assertEqual(report['status'], 200)
+        self.assertEqual(report['query_count'], len(report['queries']))
+        self.assertTrue(any(
+            query['site'] and query['site'].startswith('posts/')
+            for query in report['queries']
+        ))
+        templates = {span['name']: span for span in report['templates']}
+        self.assertEqual(templates['posts/index.html']['depth'], 0)
+        self.assertGreater(templates['includes/post.html']['depth'], 0)
+        self.assertEqual(
+            {event['cat'] for event in report['traceEvents']},
+            {'request', 'sql', 'template'}
+        )
+
+    def test_profiled_request_skips_page_cache(self):
+        """Запрос с профилем не отдаётся из кэша страниц."""
+        self.client.get(self.url)
+        response = self.client.get(
+            self.url, HTTP_X_PROFILE=make_token(self.url)
+        )
+        self.assertTrue(self.report(response)['templates'])
+
+    def test_forged_header_keeps_page_cache(self):
+        """Поддельный заголовок не отключает кэш страниц."""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_X_PROFILE='x')
+        self.assertFalse(response.has_header('X-Profile-Report'))
+
+    def test_token_is_bound_to_path(self):
+        """Токен для одного пути не включает профиль на другом."""
+        response = self.client.get(
+            reverse('posts:search'), HTTP_X_PROFILE=make_token(self.url)
+        )
+        self.assertFalse(response.has_header('X-Profile-Report'))
+
+    @override_settings(PROFILING_MAX_REPORTS=2)
+    def test_reports_are_capped(self):
+        """Старые отчёты удаляются сверх лимита."""
+        for _ in range(4):
+            self.client.get(self.url, HTTP_X_PROFILE=make_token(self.url))
+        self.assertEqual(len([
+            name for name in os.listdir(PROFILING_DIR)
+            if name.endswith('.json')
+        ]), 2)
+
+    def test_bad_signature_is_ignored(self):
+        """Неверная подпись заголовка игнорируется."""
+        response = self.client.get(
+            self.url, HTTP_X_PROFILE=make_token(self.url) + 'x'
+        )
+        self.assertFalse(response.has_header('X-Profile-Report'))
+
+    def test_query_param_is_staff_only(self):
+        """Параметр запроса работает только для персонала."""
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, {'_profile': '1'})
+        self.assertFalse(response.has_header('X-Profile-Report'))
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url, {'_profile': '1'})
+        self.assertEqual(self.report(response)['mode'], 'trace')
+
+    def test_sampling_writes_folded_stacks(self):
+        """Режим sample пишет стеки в формате flamegraph."""
+        token = make_token(self.url, 'sample')
+        with override_settings(PROFILING_SAMPLE_INTERVAL=0.0001):
+            response = self.client.get(self.url, HTTP_X_PROFILE=token)
+        folded = self.report(response, '.folded')
+        stack, count = folded.splitlines()[0].rsplit(' ', 1)
+        self.assertIn(';', stack)
+        self.assertGreater(int(count), 0)
+
+    def test_token_command(self):
+        """Команда выдаёт рабочий токен."""
+        out = StringIO()
+        call_command(
+            'profiling_token', self.url, '--mode=sample', stdout=out
+        )
+        response = self.client.get(
+            self.url, HTTP_X_PROFILE=out.getvalue().strip()
+        )
+        self.assertEqual(self.report(response)['mode'], 'sample')
@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import metrics
 
 
 def page_not_found(request, exception):
@@ -11,3 +16,17 @@ def csrf_failure(request, reason=''):
 
 def server_error(request, *args, **argv):
     return render(request, 'core/500.html')
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    scraper = token and constant_time_compare(
+        authorization, f'Bearer {token}'
+    )
+    if not scraper and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.exposition(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Group, Post
+from .models import Group, Post, Tag
+from .search import match_expression, matching_ids, search_available
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,6 +11,13 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_available() or not match_expression(search_term):
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(pk__in=matching_ids(search_term)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description',)
@@ -17,5 +25,11 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'posts_count')
+    search_fields = ('name',)
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
+admin.site.register(Tag, TagAdmin)
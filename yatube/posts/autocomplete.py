@@ -0,0 +1,154 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Group, IndexChange, User
+
+
+class PrefixIndex:
+    """Отсортированный список ключей с поиском по префиксу через bisect."""
+
+    def __init__(self, rows=()):
+        # Индекс общий для потоков процесса: поиск не должен видеть
+        # ключ, чья запись уже удалена.
+        self.lock = threading.Lock()
+        self.keys = []
+        self.items = {}
+        for pk, keys, item in rows:
+            self.items[pk] = (keys, item)
+            self.keys.extend((key, pk) for key in keys)
+        self.keys.sort()
+
+    def add(self, pk, keys, item):
+        self.replace([pk], [(pk, keys, item)])
+
+    def remove(self, pk):
+        self.replace([pk], [])
+
+    def replace(self, pks, rows):
+        with self.lock:
+            for pk in pks:
+                self._remove(pk)
+            for pk, keys, item in rows:
+                self._remove(pk)
+                self.items[pk] = (keys, item)
+                for key in keys:
+                    insort(self.keys, (key, pk))
+
+    def _remove(self, pk):
+        keys, _ = self.items.pop(pk, ((), None))
+        for key in keys:
+            index = bisect_left(self.keys, (key, pk))
+            if index < len(self.keys) and self.keys[index] == (key, pk):
+                del self.keys[index]
+
+    def search(self, prefix, limit):
+        prefix = prefix.casefold()
+        found = {}
+        with self.lock:
+            index = bisect_left(self.keys, (prefix,))
+            while index < len(self.keys) and len(found) < limit:
+                key, pk = self.keys[index]
+                if not key.startswith(prefix):
+                    break
+                found.setdefault(pk, self.items[pk][1])
+                index += 1
+        return list(found.values())
+
+
+def user_rows(queryset):
+    for pk, username, first_name, last_name in queryset.values_list(
+        'pk', 'username', 'first_name', 'last_name'
+    ).iterator():
+        full_name = f'{first_name} {last_name}'.strip()
+        yield pk, [username.casefold()], {
+            'id': username,
+            'text': username,
+            'full_text': (
+                f'{username} ({full_name})' if full_name else username
+            ),
+        }
+
+
+def group_rows(queryset):
+    for pk, title, slug in queryset.values_list(
+        'pk', 'title', 'slug'
+    ).iterator():
+        keys = {title.casefold(), slug.casefold()}
+        yield pk, sorted(keys), {'id': pk, 'text': title}
+
+
+SOURCES = {
+    'users': (User, user_rows),
+    'groups': (Group, group_rows),
+}
+
+
+class LoadedIndex:
+    """Индекс процесса и номер последнего применённого изменения."""
+
+    def __init__(self, kind):
+        model, rows = SOURCES[kind]
+        self.kind = kind
+        self.last_change = IndexChange.objects.aggregate(
+            last=Max('pk')
+        )['last'] or 0
+        self.index = PrefixIndex(rows(model.objects.all()))
+        self.synced = time.monotonic()
+
+    def idle(self):
+        return time.monotonic() - self.synced
+
+    def sync(self):
+        if self.idle() < settings.AUTOCOMPLETE_SYNC_INTERVAL:
+            return
+        changes = list(IndexChange.objects.filter(
+            kind=self.kind, pk__gt=self.last_change
+        ).order_by('pk').values_list('pk', 'object_id'))
+        self.synced = time.monotonic()
+        if changes:
+            self.last_change = changes[-1][0]
+            self.apply({object_id for _, object_id in changes})
+
+    def apply(self, pks):
+        model, rows = SOURCES[self.kind]
+        self.index.replace(pks, list(rows(model.objects.filter(pk__in=pks))))
+
+
+_indexes = {}
+
+
+def get_index(kind):
+    loaded = _indexes.get(kind)
+    retention = settings.AUTOCOMPLETE_CHANGES_RETENTION
+    if loaded is None or loaded.idle() > retention:
+        loaded = _indexes[kind] = LoadedIndex(kind)
+    else:
+        loaded.sync()
+    return loaded.index
+
+
+def lookup(kind, prefix, limit):
+    return get_index(kind).search(prefix, limit)
+
+
+def refresh(kind, pk):
+    retention = timedelta(seconds=settings.AUTOCOMPLETE_CHANGES_RETENTION)
+    IndexChange.objects.filter(created__lt=timezone.now() - retention).delete()
+    change = IndexChange.objects.create(kind=kind, object_id=pk)
+    loaded = _indexes.get(kind)
+    if loaded is None:
+        return
+    loaded.apply({pk})
+    if loaded.last_change == change.pk - 1:
+        loaded.last_change = change.pk
+
+
+def refresh_on_commit(kind, pk):
+    transaction.on_commit(lambda: refresh(kind, pk))
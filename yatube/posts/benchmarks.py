@@ -0,0 +1,259 @@
+import random
+from itertools import accumulate, islice
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.template import engines
+from django.template.loader import get_template
+from django.test import Client
+from django.test.utils import modify_settings, override_settings
+from django.urls import reverse
+
+from .autocomplete import PrefixIndex, user_rows
+from .models import Follow, Group, Post, PulledAuthor, TimelineEntry
+from .search import search_available, search_posts
+from .timeline import followings_feed
+
+User = get_user_model()
+
+
+FULL_PAGE_RANGE_TEMPLATE = (
+    '{% for i in page_obj.paginator.page_range %}'
+    '<li class="page-item"><a class="page-link" href="?page={{ i }}">'
+    '{{ i }}</a></li>'
+    '{% endfor %}'
+)
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        timings.append(perf_counter() - start)
+    return min(timings)
+
+
+def paginator_render(repeat=5, full_range_limit=100_000):
+    template = get_template('includes/paginator.html')
+    full_range = engines['django'].from_string(FULL_PAGE_RANGE_TEMPLATE)
+    rows = [('страниц', 'оконный, мс', 'полный, мс', 'размер HTML')]
+    for num_pages in (10, 1_000, 100_000, 1_000_000):
+        pager = Paginator(
+            range(num_pages * settings.ON_PAGE), settings.ON_PAGE
+        )
+        context = {'page_obj': pager.page(num_pages // 2 or 1)}
+        html = template.render(context)
+        windowed = best_of(lambda: template.render(context), repeat)
+        full = '—'
+        if num_pages <= full_range_limit:
+            full = '%.3f' % (best_of(
+                lambda: full_range.render(context), repeat
+            ) * 1000)
+        rows.append((num_pages, '%.3f' % (windowed * 1000), full, len(html)))
+    return rows
+
+
+def create_follow_graph(readers, authors):
+    User.objects.bulk_create(
+        User(username=f'bench-reader-{i}') for i in range(readers)
+    )
+    User.objects.bulk_create(
+        User(username=f'bench-author-{i}') for i in range(authors)
+    )
+    reader_ids = list(User.objects.filter(
+        username__startswith='bench-reader-'
+    ).values_list('id', flat=True))
+    author_ids = list(User.objects.filter(
+        username__startswith='bench-author-'
+    ).values_list('id', flat=True))
+    Follow.objects.bulk_create(
+        (
+            Follow(user_id=reader_id, author_id=author_id)
+            for rank, author_id in enumerate(author_ids, start=1)
+            for reader_id in reader_ids[:readers // rank]
+        )
+    )
+    return User.objects.get(pk=reader_ids[0]), author_ids
+
+
+def hybrid_feed(repeat=5, readers=2000, authors=50, posts_per_author=3):
+    rows = [('порог', 'записей на пост', 'запись, мс', 'чтение, мс')]
+    with transaction.atomic():
+        reader, author_ids = create_follow_graph(readers, authors)
+        for threshold in (readers + 1, readers // 10, readers // 50):
+            PulledAuthor.objects.all().delete()
+            TimelineEntry.objects.all().delete()
+            Post.objects.all().delete()
+            with override_settings(FEED_PULL_FOLLOWER_THRESHOLD=threshold):
+                start = perf_counter()
+                for _ in range(posts_per_author):
+                    for author_id in author_ids:
+                        Post.objects.create(author_id=author_id, text='.')
+                posts = posts_per_author * len(author_ids)
+                write = (perf_counter() - start) / posts
+                read = best_of(lambda: Paginator(
+                    followings_feed(reader), settings.ON_PAGE
+                ).page(1).object_list, repeat)
+            rows.append((
+                threshold,
+                '%.1f' % (TimelineEntry.objects.count() / posts),
+                '%.3f' % (write * 1000),
+                '%.3f' % (read * 1000),
+            ))
+        transaction.set_rollback(True)
+    return rows
+
+
+def requests_per_second(client, url, requests):
+    client.get(url)
+    return requests / best_of(
+        lambda: [client.get(url) for _ in range(requests)], 1
+    )
+
+
+def anonymous_pages(repeat=5, posts=100, requests=200):
+    rows = [('страница', 'без кэша, rps', 'с кэшем, rps')]
+    with transaction.atomic():
+        author = User.objects.create(username='bench-author')
+        group = Group.objects.create(title='bench', slug='bench-group')
+        Post.objects.bulk_create(
+            Post(author=author, group=group, text=f'Пост {i}')
+            for i in range(posts)
+        )
+        pages = {
+            'index': reverse('posts:main_page'),
+            'group_posts': reverse(
+                'posts:group_list', kwargs={'slug': group.slug}
+            ),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': author.username}
+            ),
+            'post_detail': reverse(
+                'posts:post_detail',
+                kwargs={'post_id': author.posts.latest('pk').pk}
+            ),
+        }
+        cache.clear()
+        with modify_settings(MIDDLEWARE={
+            'remove': 'posts.middleware.AnonymousPageCacheMiddleware'
+        }):
+            uncached = Client()
+            before = {
+                name: max(
+                    requests_per_second(uncached, url, requests)
+                    for _ in range(repeat)
+                )
+                for name, url in pages.items()
+            }
+        cached = Client()
+        for name, url in pages.items():
+            after = max(
+                requests_per_second(cached, url, requests)
+                for _ in range(repeat)
+            )
+            rows.append((name, '%.0f' % before[name], '%.0f' % after))
+        transaction.set_rollback(True)
+    return rows
+
+
+def random_texts(count, words=20, vocabulary=50_000, seed=0):
+    rng = random.Random(seed)
+    syllables = ['ка', 'ро', 'ми', 'ту', 'ле', 'на', 'зо', 'пи', 'се', 'да']
+    vocabulary = [
+        ''.join(rng.choice(syllables) for _ in range(rng.randint(2, 5)))
+        for _ in range(vocabulary)
+    ]
+    cum_weights = list(accumulate(
+        1 / rank for rank in range(1, len(vocabulary) + 1)
+    ))
+    for _ in range(count):
+        yield ' '.join(
+            rng.choices(vocabulary, cum_weights=cum_weights, k=words)
+        )
+
+
+def like_search(query):
+    return Post.objects.filter(text__icontains=query).order_by('-pub_date')
+
+
+def post_search(repeat=5, posts=1_000_000, batch_size=10_000):
+    rows = [('запрос', 'найдено', 'LIKE, мс', 'FTS, мс')]
+    if not search_available():
+        return rows + [('полнотекстовый индекс недоступен', '', '', '')]
+    with transaction.atomic():
+        author = User.objects.create(username='bench-author')
+        texts = random_texts(posts)
+        while True:
+            batch = list(islice(texts, batch_size))
+            if not batch:
+                break
+            Post.objects.bulk_create(
+                Post(author=author, text=text) for text in batch
+            )
+        words = author.posts.values_list('text', flat=True)[0].split()
+        for query in (words[0], words[-1], ' '.join(words[:2])):
+            found = search_posts(query).count()
+            like = best_of(lambda: (
+                like_search(query).count(),
+                list(like_search(query)[:settings.ON_PAGE]),
+            ), repeat)
+            fts = best_of(lambda: (
+                search_posts(query).count(),
+                list(search_posts(query)[:settings.ON_PAGE]),
+            ), repeat)
+            rows.append((
+                query, found, '%.1f' % (like * 1000), '%.1f' % (fts * 1000)
+            ))
+        transaction.set_rollback(True)
+    return rows
+
+
+def autocomplete_lookup(repeat=5, sizes=(1_000, 100_000), lookups=1000):
+    rows = [('записей', 'загрузка, мс', 'индекс, мкс', 'LIKE, мкс')]
+    for size in sizes:
+        with transaction.atomic():
+            texts = random_texts(size, words=1, seed=size)
+            User.objects.bulk_create(
+                User(username=f'{text}{i}') for i, text in enumerate(texts)
+            )
+            load = best_of(
+                lambda: PrefixIndex(user_rows(User.objects.all())), repeat
+            )
+            index = PrefixIndex(user_rows(User.objects.all()))
+            prefixes = [
+                username[:3] for username in User.objects.values_list(
+                    'username', flat=True
+                )[:lookups]
+            ]
+            indexed = best_of(lambda: [
+                index.search(prefix, settings.AUTOCOMPLETE_LIMIT)
+                for prefix in prefixes
+            ], repeat) / len(prefixes)
+            like = best_of(lambda: [
+                list(User.objects.filter(
+                    username__istartswith=prefix
+                ).order_by('username')[:settings.AUTOCOMPLETE_LIMIT])
+                for prefix in prefixes[:100]
+            ], 1) / len(prefixes[:100])
+            rows.append((
+                size,
+                '%.1f' % (load * 1000),
+                '%.1f' % (indexed * 1_000_000),
+                '%.1f' % (like * 1_000_000),
+            ))
+            transaction.set_rollback(True)
+    return rows
+
+
+SCENARIOS = {
+    'anonymous': anonymous_pages,
+    'autocomplete': autocomplete_lookup,
+    'hybrid': hybrid_feed,
+    'paginator': paginator_render,
+    'search': post_search,
+}
@@ -0,0 +1,49 @@
+import logging
+import os
+import traceback
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def view_budget(func):
+    return getattr(func, 'query_budget', None)
+
+
+def request_budget(request):
+    match = getattr(request, 'resolver_match', None)
+    return view_budget(match.func) if match is not None else None
+
+
+def project_stack():
+    return [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(settings.BASE_DIR)
+        and 'site-packages' not in frame.filename
+        and os.path.basename(frame.filename) not in ('budget.py', 'manage.py')
+    ]
+
+
+class QueryLog:
+    def __init__(self, with_stacks=False):
+        self.with_stacks = with_stacks
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        stack = project_stack() if self.with_stacks else []
+        self.queries.append((sql, stack))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def report(self):
+        lines = []
+        for number, (sql, stack) in enumerate(self.queries, start=1):
+            lines.append(f'{number}. {sql}')
+            lines.extend(
+                '    ' + line.rstrip('\n')
+                for line in traceback.format_list(stack)
+            )
+        return '\n'.join(lines)
@@ -0,0 +1,178 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import urlencode
+
+from core.metrics import count_lookup, lookup_counts
+
+from .counts import FEED_NAMES
+
+
+def generation_key(feed):
+    return f'feed_generation:{feed}'
+
+
+def new_generation():
+    return time.time_ns() // 1000
+
+
+def feed_generation(feed):
+    key = generation_key(feed)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, new_generation(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def feed_generations(feeds):
+    keys = {generation_key(feed): feed for feed in feeds}
+    generations = {
+        keys[key]: generation
+        for key, generation in cache.get_many(list(keys)).items()
+    }
+    for feed in feeds:
+        if feed not in generations:
+            generations[feed] = feed_generation(feed)
+    return generations
+
+
+def bump_generations(feeds):
+    keys = [generation_key(feed) for feed in feeds]
+    current = cache.get_many(keys)
+    generation = new_generation()
+    cache.set_many({
+        key: max(generation, (current.get(key) or 0) + 1) for key in keys
+    }, None)
+
+
+def invalidate_feeds(feeds):
+    feeds = set(feeds)
+    if feeds:
+        bump_generations(feeds)
+        transaction.on_commit(lambda: bump_generations(feeds))
+
+
+def page_cache_key(feed, page):
+    generations = feed_generations([feed, FEED_NAMES])
+    return (
+        f'feed_page:{feed}:{generations[feed]}:'
+        f'{generations[FEED_NAMES]}:{page}'
+    )
+
+
+def cached_page(feed, page, build):
+    key = page_cache_key(feed, page)
+    value = cache.get(key)
+    count_lookup('feed_page', value is not None)
+    if value is None:
+        value = build()
+        cache.set(key, value, settings.FEED_CACHE_TIMEOUT)
+    return value
+
+
+def short_digest(shown):
+    return hashlib.md5(shown.encode()).hexdigest()[:12]
+
+
+def author_version(author):
+    return short_digest(
+        f'{author.username}|{author.first_name}|{author.last_name}'
+    )
+
+
+def thumbnail_version(post):
+    srcsets = getattr(post, 'srcsets', None) or {}
+    return short_digest('|'.join(
+        f'{format_}={srcset}' for format_, srcset in sorted(srcsets.items())
+    ))
+
+
+def card_cache_key(post):
+    version = int(post.modified.timestamp() * 1000000)
+    return (
+        f'post_card:{post.pk}:{version}:{author_version(post.author)}:'
+        f'{thumbnail_version(post)}'
+    )
+
+
+def cached_card(post, render):
+    key = card_cache_key(post)
+    html = cache.get(key)
+    count_lookup('post_card', html is not None)
+    if html is None:
+        html = render()
+        cache.set(key, html, settings.POST_CARD_TIMEOUT)
+    return html
+
+
+def card_cache_stats():
+    hits, misses = lookup_counts('post_card')
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / lookups if lookups else 0.0,
+    }
+
+
+PAGE_QUERY_PARAMS = ('page', 'after', 'before')
+
+
+def cache_for_anonymous(request, *feeds):
+    request.page_cache_feeds = feeds
+
+
+def anonymous_page_key(request):
+    query = urlencode([
+        (name, request.GET[name])
+        for name in PAGE_QUERY_PARAMS if name in request.GET
+    ])
+    url = f'{request.path}?{query}'.encode()
+    return f'anonymous_page:{hashlib.md5(url).hexdigest()}'
+
+
+def cached_response(key):
+    entry = cache.get(key)
+    if entry is not None:
+        generations, response = entry
+        current = cache.get_many(
+            [generation_key(feed) for feed in generations]
+        )
+        if all(
+            current.get(generation_key(feed)) == generation
+            for feed, generation in generations.items()
+        ):
+            count_lookup('anonymous_page', True)
+            return response
+    count_lookup('anonymous_page', False)
+    return None
+
+
+def store_response(key, feeds, response):
+    generations = feed_generations(feeds)
+    cache.set(
+        key,
+        (generations, response),
+        settings.ANONYMOUS_PAGE_CACHE_TIMEOUT
+    )
+
+
+def page_validators(request, feeds, modified=None):
+    feeds = {*feeds, FEED_NAMES}
+    generations = feed_generations(feeds)
+    last_modified = datetime.fromtimestamp(
+        max(generations.values()) / 1000000, timezone.utc
+    )
+    if modified is not None:
+        last_modified = max(last_modified, modified)
+    viewer = request.session.session_key or ''
+    state = ':'.join(
+        [viewer] + [f'{feed}={generations[feed]}' for feed in sorted(feeds)]
+    )
+    etag = hashlib.md5(state.encode()).hexdigest()
+    return etag, last_modified
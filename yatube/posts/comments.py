@@ -0,0 +1,36 @@
+from django.conf import settings
+
+from .models import Comment
+
+LATEST_COMMENTS_SQL = '''
+    posts_comment.id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY post_id ORDER BY created DESC, id DESC
+            ) AS position
+            FROM posts_comment
+            WHERE post_id IN ({placeholders})
+        ) WHERE position <= %s
+    )
+'''
+
+
+def latest_comments(post_ids, limit):
+    sql = LATEST_COMMENTS_SQL.format(
+        placeholders=', '.join(['%s'] * len(post_ids))
+    )
+    return Comment.objects.extra(
+        where=[sql], params=[*post_ids, limit]
+    ).select_related('author').order_by('post_id', '-created', '-id')
+
+
+def prefetch_latest_comments(posts, limit=None):
+    limit = settings.FEED_COMMENTS_PREVIEW if limit is None else limit
+    for post in posts:
+        post.latest_comments = []
+    post_ids = [post.pk for post in posts if post.comments_count]
+    if not post_ids or limit <= 0:
+        return
+    by_pk = {post.pk: post for post in posts}
+    for comment in latest_comments(post_ids, limit):
+        by_pk[comment.post_id].latest_comments.append(comment)
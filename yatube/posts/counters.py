@@ -0,0 +1,88 @@
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import (Comment, Follow, Group, Post, PostTag, Tag, User,
+                     UserCounters)
+
+COUNTERS = {
+    UserCounters: {
+        'posts_count': (Post, 'author_id'),
+        'followers_count': (Follow, 'author_id'),
+        'followings_count': (Follow, 'user_id'),
+    },
+    Group: {'posts_count': (Post, 'group_id')},
+    Post: {'comments_count': (Comment, 'post_id')},
+    Tag: {'posts_count': (PostTag, 'tag_id')},
+}
+COUNTED_ROWS = {UserCounters: User, Group: Group, Post: Post, Tag: Tag}
+
+
+def counter_updates(deltas):
+    return {
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    }
+
+
+def bump(model, pk, **deltas):
+    return model.objects.filter(pk=pk).update(**counter_updates(deltas))
+
+
+def bump_many(model, pks, **deltas):
+    return model.objects.filter(pk__in=pks).update(**counter_updates(deltas))
+
+
+def bump_user(user_id, create_missing=True, **deltas):
+    if not bump(UserCounters, user_id, **deltas) and create_missing:
+        reconcile(UserCounters, [user_id])
+
+
+def actual_counts(pks, source, fk):
+    return dict(
+        source.objects.filter(**{f'{fk}__in': pks}).order_by().values(
+            fk
+        ).annotate(total=Count('pk')).values_list(fk, 'total')
+    )
+
+
+def reconcile(model, pks):
+    fields = COUNTERS[model]
+    actual = {
+        field: actual_counts(pks, source, fk)
+        for field, (source, fk) in fields.items()
+    }
+    stored = model.objects.only(*fields).in_bulk(pks)
+    missing, drifted = [], []
+    for pk in pks:
+        values = {field: actual[field].get(pk, 0) for field in fields}
+        row = stored.get(pk)
+        if row is None:
+            if model is UserCounters:
+                missing.append(UserCounters(user_id=pk, **values))
+            continue
+        if any(getattr(row, field) != value
+               for field, value in values.items()):
+            for field, value in values.items():
+                setattr(row, field, value)
+            drifted.append(row)
+    model.objects.bulk_create(missing, ignore_conflicts=True)
+    model.objects.bulk_update(drifted, list(fields))
+    return len(missing) + len(drifted)
+
+
+def reconcile_all(batch_size):
+    for model, counted in COUNTED_ROWS.items():
+        checked = fixed = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                counted.objects.filter(pk__gt=last_pk).order_by(
+                    'pk'
+                ).values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            fixed += reconcile(model, pks)
+            checked += len(pks)
+            last_pk = pks[-1]
+        yield model._meta.verbose_name, checked, fixed
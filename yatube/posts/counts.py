@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Min
+
+from .models import Group, Tag, UserCounters
+
+FEED_ALL = 'all'
+# Страницы хранят посты вместе с автором и группой, поэтому смена
+# имени или названия сбрасывает их через это поколение.
+FEED_NAMES = 'names'
+
+
+def feed_key(kind, pk=None):
+    return kind if pk is None else f'{kind}:{pk}'
+
+
+def post_feeds(author_id, group_id):
+    feeds = [FEED_ALL, feed_key('author', author_id)]
+    if group_id is not None:
+        feeds.append(feed_key('group', group_id))
+    return feeds
+
+
+def count_cache_key(feed):
+    return f'feed_count:{feed}'
+
+
+def count_or_estimate(queryset):
+    limit = settings.FEED_COUNT_EXACT_LIMIT
+    count = queryset.order_by()[:limit + 1].count()
+    if count <= limit:
+        return count
+    ids = queryset.order_by('-id').values_list('id', flat=True)
+    edge = ids[limit]
+    span = queryset.aggregate(low=Min('id'), high=Max('id'))
+    density = (limit + 1) / (span['high'] - edge + 1)
+    return round(density * (span['high'] - span['low'] + 1))
+
+
+def feed_count(queryset, feed):
+    key = count_cache_key(feed)
+    count = cache.get(key)
+    if count is None:
+        count = stored_count(feed)
+    if count is None:
+        count = count_or_estimate(queryset)
+        remember_count(feed, count)
+    return count
+
+
+def remember_count(feed, count):
+    cache.set(count_cache_key(feed), count, settings.FEED_COUNT_TIMEOUT)
+
+
+def adjust_count(feed, delta):
+    try:
+        if delta > 0:
+            cache.incr(count_cache_key(feed), delta)
+        else:
+            cache.decr(count_cache_key(feed), -delta)
+    except ValueError:
+        pass
+
+
+def forget_count(feed):
+    cache.delete(count_cache_key(feed))
+
+
+def stored_count(feed):
+    kind, _, pk = feed.partition(':')
+    if kind == 'group':
+        counters = Group.objects.filter(pk=pk)
+    elif kind == 'author':
+        counters = UserCounters.objects.filter(user_id=pk)
+    elif kind == 'tag':
+        counters = Tag.objects.filter(pk=pk)
+    else:
+        return None
+    return counters.values_list('posts_count', flat=True).first()
@@ -0,0 +1,253 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from faker import Faker
+
+from .counters import reconcile_all
+from .models import (Comment, Follow, Group, Post, PostTag, PulledAuthor,
+                     TimelineEntry, User)
+from .tags import extract_tags, tag_ids
+
+SENTENCE_POOL = 5000
+SPAN = timedelta(days=365)
+BURST_GAP_MINUTES = 20
+TAGGED_SHARE = 0.3
+
+
+def heavy_tail(rng, mean, alpha=1.5):
+    """Целое с хвостом Парето и средним mean; большинство значений малы."""
+    value = mean * (alpha - 1) * (rng.paretovariate(alpha) - 1)
+    return int(value + rng.random())
+
+
+def weights(rng, count, alpha):
+    return list(accumulate(rng.paretovariate(alpha) for _ in range(count)))
+
+
+def last_pk(model):
+    return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+def insert(model, objects, batch_size):
+    objects = iter(objects)
+    total = 0
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return total
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        total += len(batch)
+
+
+def rows_after(queryset, pk, batch_size, *fields):
+    while True:
+        rows = list(queryset.filter(pk__gt=pk).order_by('pk').values_list(
+            'pk', *fields
+        )[:batch_size])
+        if not rows:
+            return
+        yield from rows
+        pk = rows[-1][0]
+
+
+@contextmanager
+def explicit_dates(*fields):
+    saved = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, saved):
+            field.auto_now_add = value
+
+
+class Dataset:
+    """Синтетические данные масштаба бенчмарков.
+
+    Подписчики и активность авторов распределены по Парето, посты
+    выходят сериями. Всё пишется через bulk_create, поэтому сигналы не
+    срабатывают: ленты, счётчики и кэш приводятся в порядок в конце.
+    """
+
+    def __init__(self, seed=0, batch_size=10_000):
+        self.rng = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.batch_size = batch_size
+        self.now = timezone.now()
+        self.sentences = [
+            self.fake.sentence() for _ in range(SENTENCE_POOL)
+        ]
+
+    def text(self, sentences=3):
+        return ' '.join(self.rng.choices(
+            self.sentences, k=self.rng.randint(1, sentences)
+        ))
+
+    def users(self, count):
+        first = last_pk(User)
+        password = make_password(None)
+        inserted = insert(User, (
+            User(
+                username=f'{self.fake.user_name()}_{i}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+            for i in range(count)
+        ), self.batch_size)
+        self.user_ids = list(User.objects.filter(pk__gt=first).order_by(
+            'pk'
+        ).values_list('pk', flat=True))
+        return inserted
+
+    def groups(self, count):
+        first = last_pk(Group)
+        inserted = insert(Group, (
+            Group(
+                title=self.fake.word().capitalize(),
+                slug=f'group-{first + i + 1}',
+                description=self.text(),
+            )
+            for i in range(count)
+        ), self.batch_size)
+        self.group_ids = list(Group.objects.filter(pk__gt=first).order_by(
+            'pk'
+        ).values_list('pk', flat=True))
+        return inserted
+
+    def post_objects(self, count, tags):
+        activity = weights(self.rng, len(self.user_ids), 1.2)
+        tag_weights = list(accumulate(
+            1 / rank for rank in range(1, len(tags) + 1)
+        ))
+        while count > 0:
+            author_id = self.rng.choices(
+                self.user_ids, cum_weights=activity
+            )[0]
+            group_id = self.rng.choice(self.group_ids + [None])
+            burst = min(count, 1 + heavy_tail(self.rng, 2))
+            pub_date = self.now - SPAN * self.rng.random()
+            for _ in range(burst):
+                text = self.text()
+                if tags and self.rng.random() < TAGGED_SHARE:
+                    text += ' ' + ' '.join(
+                        f'#{tag}' for tag in self.rng.choices(
+                            tags, cum_weights=tag_weights,
+                            k=self.rng.randint(1, 3)
+                        )
+                    )
+                yield Post(
+                    author_id=author_id,
+                    group_id=group_id,
+                    text=text,
+                    pub_date=pub_date,
+                )
+                pub_date -= timedelta(
+                    minutes=self.rng.expovariate(1 / BURST_GAP_MINUTES)
+                )
+            count -= burst
+
+    def posts(self, count, tags=0):
+        self.first_post = last_pk(Post)
+        names = sorted({
+            self.fake.word().casefold() for _ in range(tags)
+        })
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            inserted = insert(
+                Post, self.post_objects(count, names), self.batch_size
+            )
+        ids = tag_ids(names) if names else {}
+        insert(PostTag, (
+            PostTag(post_id=pk, tag_id=ids[name], pub_date=pub_date)
+            for pk, text, pub_date in rows_after(
+                Post.objects.all(), self.first_post, self.batch_size,
+                'text', 'pub_date'
+            )
+            for name in extract_tags(text) if name in ids
+        ), self.batch_size)
+        return inserted
+
+    def follow_objects(self, followings):
+        popularity = weights(self.rng, len(self.user_ids), 1.1)
+        limit = len(self.user_ids) - 1
+        for user_id in self.user_ids:
+            count = min(limit, 1 + heavy_tail(self.rng, followings - 1))
+            authors = set()
+            while len(authors) < count:
+                authors.update(self.rng.choices(
+                    self.user_ids, cum_weights=popularity,
+                    k=count - len(authors)
+                ))
+                authors.discard(user_id)
+            for author_id in sorted(authors):
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    def follows(self, followings):
+        if followings < 1 or len(self.user_ids) < 2:
+            return 0
+        return insert(
+            Follow, self.follow_objects(followings), self.batch_size
+        )
+
+    def comment_objects(self, per_post):
+        for pk, pub_date in rows_after(
+            Post.objects.all(), self.first_post, self.batch_size, 'pub_date'
+        ):
+            created = pub_date
+            for _ in range(heavy_tail(self.rng, per_post)):
+                created += timedelta(minutes=self.rng.expovariate(1 / 60))
+                if created > self.now:
+                    break
+                yield Comment(
+                    post_id=pk,
+                    author_id=self.rng.choice(self.user_ids),
+                    text=self.text(1),
+                    created=created,
+                )
+
+    def comments(self, per_post):
+        with explicit_dates(Comment._meta.get_field('created')):
+            return insert(
+                Comment, self.comment_objects(per_post), self.batch_size
+            )
+
+    def timelines(self):
+        popular = Follow.objects.filter(
+            author_id__gte=self.user_ids[0]
+        ).values('author_id').annotate(
+            followers=Count('pk')
+        ).filter(
+            followers__gte=settings.FEED_PULL_FOLLOWER_THRESHOLD
+        ).values_list('author_id', flat=True)
+        PulledAuthor.objects.bulk_create(
+            (PulledAuthor(author_id=pk) for pk in popular),
+            ignore_conflicts=True
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {TimelineEntry._meta.db_table} '
+                '(user_id, post_id, author_id, pub_date) '
+                'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+                f'FROM {Follow._meta.db_table} f '
+                f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+                'WHERE p.id > %s AND f.author_id NOT IN '
+                f'(SELECT author_id FROM {PulledAuthor._meta.db_table})',
+                [self.first_post]
+            )
+            return cursor.rowcount
+
+    def finish(self):
+        for _ in reconcile_all(self.batch_size):
+            pass
+        cache.clear()
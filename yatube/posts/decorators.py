@@ -0,0 +1,39 @@
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .caching import cache_for_anonymous, page_validators
+
+
+def conditional_page(page_feeds):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            page = page_feeds(*args, **kwargs)
+            if page is None or request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            feeds, modified = page
+            cache_for_anonymous(request, *feeds)
+            etag, last_modified = page_validators(request, feeds, modified)
+            etag = quote_etag(etag)
+            timestamp = int(last_modified.timestamp())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp
+            )
+            if response is not None:
+                return response
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(timestamp)
+            return response
+        return wrapper
+    return decorator
+
+
+def query_budget(queries):
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
@@ -1,20 +1,38 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from django.urls import reverse_lazy
 
+from .images import ingest_image
 from .models import Comment, Group, Post
+from .widgets import AutocompleteSelect
 
 
 class PostForm(forms.ModelForm):
-    text = forms.CharField(widget=forms.Textarea, label='Текст')
+    text = forms.CharField(
+        widget=forms.Textarea(attrs={'data-mention-url': reverse_lazy(
+            'posts:autocomplete', kwargs={'kind': 'users'}
+        )}),
+        label='Текст'
+    )
     group = forms.ModelChoiceField(
         queryset=Group.objects.all(),
         required=False,
-        label='Группа'
+        label='Группа',
+        widget=AutocompleteSelect(reverse_lazy(
+            'posts:autocomplete', kwargs={'kind': 'groups'}
+        ))
     )
 
     class Meta:
         model = Post
         fields = ('text', 'image', 'group')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return ingest_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     text = forms.CharField(widget=forms.Textarea, label='Текст')
@@ -0,0 +1,149 @@
+import base64
+import math
+import os
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps
+
+from core.metrics import inc
+
+ORIENTATION_TAG = 0x0112
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+DRAFT_FORMATS = ('JPEG',)
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+
+
+def read_image(file_):
+    file_.seek(0)
+    try:
+        with Image.open(file_) as image:
+            return describe_image(image)
+    finally:
+        file_.seek(0)
+
+
+def describe_image(image):
+    width, height = image.size
+    if image.getexif().get(ORIENTATION_TAG) in TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    return width, height, placeholder(image)
+
+
+def placeholder(image):
+    size = settings.IMAGE_PLACEHOLDER_SIZE
+    image.draft('RGB', (size, size))
+    small = image.convert('RGB')
+    small.thumbnail((size, size))
+    buffer = BytesIO()
+    small.save(buffer, 'JPEG', quality=40)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/jpeg;base64,{encoded}'
+
+
+def fit_size(size, max_side):
+    scale = min(1, max_side / max(size))
+    return tuple(math.ceil(side * scale) for side in size)
+
+
+DECODE_ERRORS = (OSError, SyntaxError, Image.DecompressionBombError)
+
+
+def invalid_image():
+    return ValidationError(
+        'Загрузите правильное изображение.', code='invalid_image'
+    )
+
+
+def open_upload(uploaded):
+    uploaded.seek(0)
+    try:
+        image = Image.open(uploaded)
+    except DECODE_ERRORS:
+        raise invalid_image()
+    if image.format not in settings.IMAGE_UPLOAD_FORMATS:
+        raise ValidationError(
+            'Формат %(format)s не поддерживается.',
+            code='invalid_format',
+            params={'format': image.format},
+        )
+    width, height = image.size
+    if image.format in DRAFT_FORMATS:
+        max_pixels = settings.IMAGE_MAX_PIXELS
+    else:
+        max_pixels = settings.IMAGE_MAX_DECODED_PIXELS
+    if width * height > max_pixels:
+        raise ValidationError(
+            'Изображение %(width)s×%(height)s слишком большое.',
+            code='too_many_pixels',
+            params={'width': width, 'height': height},
+        )
+    return image
+
+
+def normalize(image):
+    max_side = settings.IMAGE_MAX_SIDE
+    image.draft(None, fit_size(image.size, max_side))
+    image.load()
+    ImageOps.exif_transpose(image, in_place=True)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if image.format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        return image.convert('RGB')
+    return image
+
+
+def save_normalized(image, output):
+    icc_profile = image.info.get('icc_profile')
+    options = {'quality': settings.IMAGE_UPLOAD_QUALITY}
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    normalized = normalize(image)
+    try:
+        normalized.save(output, image.format, **options)
+        return describe_image(normalized)
+    finally:
+        normalized.close()
+
+
+def save_animation(image, output):
+    # Frames are kept as uploaded; only the metadata is dropped.
+    metadata = describe_image(image)
+    for key in METADATA_KEYS:
+        image.info.pop(key, None)
+    image.save(output, image.format, save_all=True)
+    return metadata
+
+
+def ingest_image(uploaded):
+    image = open_upload(uploaded)
+    inc('yatube_upload_bytes_total', uploaded.size, stage='received')
+    format_ = image.format
+    if getattr(image, 'is_animated', False):
+        save = save_animation
+    else:
+        save = save_normalized
+    output = SpooledTemporaryFile(settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    try:
+        metadata = save(image, output)
+    except DECODE_ERRORS:
+        output.close()
+        raise invalid_image()
+    finally:
+        image.close()
+    size = output.tell()
+    output.seek(0)
+    inc('yatube_upload_bytes_total', size, stage='stored')
+    stem = os.path.splitext(os.path.basename(uploaded.name))[0]
+    extension = EXTENSIONS.get(format_, format_.lower())
+    ingested = UploadedFile(
+        output,
+        name=f'{stem}.{extension}',
+        content_type=Image.MIME[format_],
+        size=size,
+    )
+    ingested.image_metadata = metadata
+    return ingested
@@ -0,0 +1,55 @@
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import caching, counts
+from posts.images import read_image
+from posts.models import Post
+
+FIELDS = ('image_width', 'image_height', 'image_placeholder', 'modified')
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры и заглушки картинок у старых постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            image_width__isnull=True
+        ).order_by('pk').only('pk', 'image', 'author_id', 'group_id')
+        described = unreadable = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last_pk)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            updated = [post for post in batch if self.describe(post)]
+            unreadable += len(batch) - len(updated)
+            described += len(updated)
+            Post.objects.bulk_update(updated, FIELDS)
+            feeds = set()
+            for post in updated:
+                feeds.update(counts.post_feeds(post.author_id, post.group_id))
+                feeds.add(counts.feed_key('post', post.pk))
+            caching.invalidate_feeds(feeds)
+        self.stdout.write(
+            f'обработано {described}, не удалось прочитать {unreadable}'
+        )
+
+    def describe(self, post):
+        try:
+            with post.image.storage.open(post.image.name) as file_:
+                (
+                    post.image_width,
+                    post.image_height,
+                    post.image_placeholder,
+                ) = read_image(file_)
+        except (OSError, SuspiciousFileOperation):
+            return False
+        post.modified = timezone.now()
+        return True
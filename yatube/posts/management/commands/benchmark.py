@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts.benchmarks import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = 'Запускает бенчмарк ленты и печатает таблицу с результатами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(SCENARIOS))
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = SCENARIOS[options['scenario']](repeat=options['repeat'])
+        widths = [
+            max(len(str(row[i])) for row in rows)
+            for i in range(len(rows[0]))
+        ]
+        for row in rows:
+            self.stdout.write('  '.join(
+                str(cell).rjust(width) for cell, width in zip(row, widths)
+            ))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.caching import card_cache_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает долю попаданий в кэш карточек постов по файлам '
+        'METRICS_DIR; без него счётчики доступны только на /metrics'
+    )
+
+    def handle(self, *args, **options):
+        # Without METRICS_DIR each process counts only its own lookups,
+        # and this command has made none.
+        if not settings.METRICS_DIR:
+            raise CommandError(
+                'Не задан METRICS_DIR: счётчики кэша есть только в памяти '
+                'процессов сервера, смотрите /metrics.'
+            )
+        stats = card_cache_stats()
+        self.stdout.write(
+            f'попаданий {stats["hits"]}, промахов {stats["misses"]}, '
+            f'доля попаданий {stats["hit_rate"]:.1%}'
+        )
@@ -0,0 +1,61 @@
+import os
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import (collect_images, image_storage, release_image,
+                              thumbnails_ready)
+
+
+class Command(BaseCommand):
+    help = (
+        'Переименовывает картинки постов по хешу, удаляет дубликаты '
+        'и неиспользуемые файлы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=settings.MEDIA_GC_GRACE,
+            help='Не трогать файлы моложе стольких секунд'
+        )
+
+    def handle(self, *args, **options):
+        storage = image_storage()
+        names = list(
+            Post.objects.exclude(image='').order_by().values_list(
+                'image', flat=True
+            ).distinct()
+        )
+        renamed = unreadable = freed = 0
+        for name in names:
+            try:
+                with storage.open(name) as file_:
+                    target = storage.content_name(name, file_)
+                    if target != name and not storage.exists(target):
+                        self.link(storage, name, target, file_)
+                    elif target != name:
+                        freed += storage.size(name)
+            except (OSError, SuspiciousFileOperation):
+                unreadable += 1
+                continue
+            if target == name:
+                continue
+            Post.objects.filter(image=name).update(image=target)
+            release_image(name)
+            thumbnails_ready(target)
+            renamed += 1
+        removed, collected = collect_images(options['grace'])
+        freed += collected
+        self.stdout.write(
+            f'проверено {len(names)}, переименовано {renamed}, '
+            f'не удалось прочитать {unreadable}, удалено {removed}, '
+            f'освобождено {freed / 1024:.1f} КБ'
+        )
+
+    def link(self, storage, name, target, file_):
+        try:
+            os.link(storage.path(name), storage.path(target))
+        except OSError:
+            storage.save(target, file_)
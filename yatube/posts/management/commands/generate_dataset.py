@@ -0,0 +1,47 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.dataset import Dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, постами, '
+        'комментариями и подписками для бенчмарков'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--tags', type=int, default=1000)
+        parser.add_argument('--comments-per-post', type=float, default=2)
+        parser.add_argument('--followings', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+
+    def stage(self, name, func, *args):
+        start = perf_counter()
+        count = func(*args)
+        self.stdout.write(
+            f'{name}: {count} за {perf_counter() - start:.1f} с'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        dataset = Dataset(options['seed'], options['batch_size'])
+        self.stage('пользователи', dataset.users, options['users'])
+        self.stage('группы', dataset.groups, options['groups'])
+        self.stage('посты', dataset.posts, options['posts'], options['tags'])
+        self.stage('подписки', dataset.follows, options['followings'])
+        self.stage(
+            'комментарии', dataset.comments, options['comments_per_post']
+        )
+        self.stage('ленты подписок', dataset.timelines)
+        start = perf_counter()
+        dataset.finish()
+        self.stdout.write(
+            f'счётчики и кэш: {perf_counter() - start:.1f} с'
+        )
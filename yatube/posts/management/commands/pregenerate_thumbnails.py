@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import process_pool, safe_generate, thumbnails_ready
+
+
+class Command(BaseCommand):
+    help = 'Заранее создаёт миниатюры для всех картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+
+    def handle(self, *args, **options):
+        names = list(
+            Post.objects.exclude(image='').order_by().values_list(
+                'image', flat=True
+            ).distinct()
+        )
+        if options['workers']:
+            with process_pool(options['workers']) as pool:
+                done = pool.map(safe_generate, names, chunksize=8)
+                self.finish(names, done)
+        else:
+            self.finish(names, map(safe_generate, names))
+
+    def finish(self, names, done):
+        total = len(names)
+        for number, (name, ready) in enumerate(zip(names, done), start=1):
+            if ready is None:
+                self.stdout.write(f'{number}/{total}: {name} не удалось')
+                continue
+            thumbnails_ready(ready)
+            self.stdout.write(f'{number}/{total}: {name}')
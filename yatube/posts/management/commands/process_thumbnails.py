@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import process_jobs
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для картинок из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--interval', type=float, default=1.0)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и выйти'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            names = process_jobs(
+                settings.THUMBNAIL_BATCH_SIZE, options['workers']
+            )
+            for name in filter(None, names):
+                self.stdout.write(name)
+            if not names:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
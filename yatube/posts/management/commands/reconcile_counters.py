@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_all
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for name, checked, fixed in reconcile_all(options['batch_size']):
+            self.stdout.write(
+                f'{name}: проверено {checked}, исправлено {fixed}'
+            )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import storage_report
+
+
+class Command(BaseCommand):
+    help = 'Показывает, сколько места занимает каждый вариант картинок'
+
+    def handle(self, *args, **options):
+        rows = storage_report()
+        widths = [
+            max(len(str(row[i])) for row in rows)
+            for i in range(len(rows[0]))
+        ]
+        for row in rows:
+            self.stdout.write('  '.join(
+                str(cell).rjust(width) for cell, width in zip(row, widths)
+            ))
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from core.middleware.profiling import header_mode
+
+from .budget import QueryLog, logger, request_budget
+from .caching import anonymous_page_key, cached_response, store_response
+
+
+class AnonymousPageCacheMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        anonymous = settings.SESSION_COOKIE_NAME not in request.COOKIES
+        profiled = header_mode(request) is not None
+        if (
+            not anonymous or profiled
+            or request.method not in ('GET', 'HEAD')
+        ):
+            return self.get_response(request)
+        key = anonymous_page_key(request)
+        response = cached_response(key)
+        if response is not None:
+            return get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified', '')
+                ),
+                response=response
+            )
+        response = self.get_response(request)
+        feeds = getattr(request, 'page_cache_feeds', None)
+        cacheable = (
+            feeds
+            and request.method == 'GET'
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+        )
+        if cacheable:
+            store_response(key, feeds, response)
+        return response
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        if not settings.QUERY_BUDGET_CHECK:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return self.get_response(request)
+        log = QueryLog(with_stacks=True)
+        with connection.execute_wrapper(log):
+            response = self.get_response(request)
+        budget = request_budget(request)
+        if budget is not None and len(log) > budget:
+            logger.warning(
+                '%s %s: %d queries over a budget of %d\n%s',
+                request.method, request.path, len(log), budget, log.report()
+            )
+        return response
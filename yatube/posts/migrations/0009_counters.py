@@ -0,0 +1,71 @@
+# Generated by Django 2.2.19 on 2026-10-18 11:05
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def grouped_counts(model, fk):
+    return dict(
+        model.objects.order_by().values(fk).annotate(
+            total=Count('pk')
+        ).values_list(fk, 'total')
+    )
+
+
+def populate_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    posts = grouped_counts(Post, 'author_id')
+    followers = grouped_counts(Follow, 'author_id')
+    followings = grouped_counts(Follow, 'user_id')
+    UserCounters.objects.bulk_create(
+        UserCounters(
+            user_id=pk,
+            posts_count=posts.get(pk, 0),
+            followers_count=followers.get(pk, 0),
+            followings_count=followings.get(pk, 0),
+        )
+        for pk in User.objects.values_list('pk', flat=True).iterator()
+    )
+    for pk, total in grouped_counts(Post, 'group_id').items():
+        if pk is not None:
+            Group.objects.filter(pk=pk).update(posts_count=total)
+    for pk, total in grouped_counts(Comment, 'post_id').items():
+        Post.objects.filter(pk=pk).update(comments_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0008_pulledauthor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('followings_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
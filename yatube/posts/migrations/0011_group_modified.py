@@ -0,0 +1,22 @@
+# Generated by Django 2.2.19 on 2026-10-18 13:02
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='modified',
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
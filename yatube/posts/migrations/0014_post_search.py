@@ -0,0 +1,110 @@
+from django.db import migrations
+
+POST_ROW = '''
+    SELECT p.id, p.text,
+        trim(u.username || ' ' || u.first_name || ' ' || u.last_name),
+        coalesce(g.title, '')
+    FROM posts_post p
+    JOIN auth_user u ON u.id = p.author_id
+    LEFT JOIN posts_group g ON g.id = p.group_id
+'''
+
+CREATE_SQL = [
+    '''
+    CREATE VIRTUAL TABLE posts_post_search USING fts5(
+        text, author, group_title,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    ''',
+    f'''
+    CREATE TRIGGER posts_post_search_insert AFTER INSERT ON posts_post
+    BEGIN
+        INSERT INTO posts_post_search (rowid, text, author, group_title)
+        {POST_ROW} WHERE p.id = new.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER posts_post_search_update
+    AFTER UPDATE OF text, author_id, group_id ON posts_post
+    BEGIN
+        DELETE FROM posts_post_search WHERE rowid = old.id;
+        INSERT INTO posts_post_search (rowid, text, author, group_title)
+        {POST_ROW} WHERE p.id = new.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER posts_post_search_delete AFTER DELETE ON posts_post
+    BEGIN
+        DELETE FROM posts_post_search WHERE rowid = old.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER posts_post_search_author
+    AFTER UPDATE OF username, first_name, last_name ON auth_user
+    BEGIN
+        DELETE FROM posts_post_search WHERE rowid IN (
+            SELECT id FROM posts_post WHERE author_id = new.id
+        );
+        INSERT INTO posts_post_search (rowid, text, author, group_title)
+        {POST_ROW} WHERE p.author_id = new.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER posts_post_search_group
+    AFTER UPDATE OF title ON posts_group
+    BEGIN
+        DELETE FROM posts_post_search WHERE rowid IN (
+            SELECT id FROM posts_post WHERE group_id = new.id
+        );
+        INSERT INTO posts_post_search (rowid, text, author, group_title)
+        {POST_ROW} WHERE p.group_id = new.id;
+    END
+    ''',
+    f'''
+    INSERT INTO posts_post_search (rowid, text, author, group_title)
+    {POST_ROW}
+    ''',
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS posts_post_search_group',
+    'DROP TRIGGER IF EXISTS posts_post_search_author',
+    'DROP TRIGGER IF EXISTS posts_post_search_delete',
+    'DROP TRIGGER IF EXISTS posts_post_search_update',
+    'DROP TRIGGER IF EXISTS posts_post_search_insert',
+    'DROP TABLE IF EXISTS posts_post_search',
+]
+
+
+def fts5_available(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        options = {row[0] for row in cursor.fetchall()}
+    return 'ENABLE_FTS5' in options
+
+
+def create_search_index(apps, schema_editor):
+    if fts5_available(schema_editor):
+        for sql in CREATE_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in DROP_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0013_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 2.2.19 on 2026-10-18 11:30
+
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+TAG_RE = re.compile(r'(?<![\w#&])#(\w+)')
+
+
+def populate_tags(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    PostTag = apps.get_model('posts', 'PostTag')
+    Tag = apps.get_model('posts', 'Tag')
+    post_tags = {}
+    for pk, text, pub_date in Post.objects.filter(
+        text__contains='#'
+    ).values_list('pk', 'text', 'pub_date').iterator():
+        for name in TAG_RE.findall(text):
+            name = unicodedata.normalize('NFKC', name).casefold()
+            if len(name) <= 100:
+                post_tags[pk, name] = pub_date
+    names = {name for _, name in post_tags}
+    Tag.objects.bulk_create(Tag(name=name) for name in names)
+    ids = dict(Tag.objects.values_list('name', 'pk'))
+    PostTag.objects.bulk_create(
+        PostTag(post_id=pk, tag_id=ids[name], pub_date=pub_date)
+        for (pk, name), pub_date in post_tags.items()
+    )
+    for name, total in Counter(name for _, name in post_tags).items():
+        Tag.objects.filter(pk=ids[name]).update(posts_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('posts_count', models.PositiveIntegerField(default=0, editable=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Post')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Tag')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', '-pub_date', '-post'], name='post_tag_pub_date_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='posttag',
+            unique_together={('post', 'tag')},
+        ),
+        migrations.RunPython(populate_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+from django.db import migrations
+
+POST_ROW = '''
+    SELECT p.id, p.text,
+        trim(u.username || ' ' || u.first_name || ' ' || u.last_name),
+        coalesce(g.title, '')
+    FROM posts_post p
+    JOIN auth_user u ON u.id = p.author_id
+    LEFT JOIN posts_group g ON g.id = p.group_id
+'''
+
+TRIGGERS = [
+    'posts_post_search_update',
+    'posts_post_search_author',
+    'posts_post_search_group',
+]
+
+GUARDED_SQL = [
+    f'''
+    CREATE TRIGGER posts_post_search_update
+    AFTER UPDATE OF text, author_id, group_id ON posts_post
+    WHEN old.text IS NOT new.text
+        OR old.author_id IS NOT new.author_id
+        OR old.group_id IS NOT new.group_id
+    BEGIN
+        DELETE FROM posts_post_search WHERE rowid = old.id;
+        INSERT INTO posts_post_search (rowid, text, author, group_title)
+        {POST_ROW} WHERE p.id = new.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER posts_post_search_author
+    AFTER UPDATE OF username, first_name, last_name ON auth_user
+    WHEN old.username IS NOT new.username
+        OR old.first_name IS NOT new.first_name
+        OR old.last_name IS NOT new.last_name
+    BEGIN
+        DELETE FROM posts_post_search WHERE rowid IN (
+            SELECT id FROM posts_post WHERE author_id = new.id
+        );
+        INSERT INTO posts_post_search (rowid, text, author, group_title)
+        {POST_ROW} WHERE p.author_id = new.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER posts_post_search_group
+    AFTER UPDATE OF title ON posts_group
+    WHEN old.title IS NOT new.title
+    BEGIN
+        DELETE FROM posts_post_search WHERE rowid IN (
+            SELECT id FROM posts_post WHERE group_id = new.id
+        );
+        INSERT INTO posts_post_search (rowid, text, author, group_title)
+        {POST_ROW} WHERE p.group_id = new.id;
+    END
+    ''',
+]
+
+
+def search_index_exists(schema_editor):
+    connection = schema_editor.connection
+    return (
+        connection.vendor == 'sqlite'
+        and 'posts_post_search' in connection.introspection.table_names()
+    )
+
+
+def guard_triggers(apps, schema_editor):
+    if search_index_exists(schema_editor):
+        for name in TRIGGERS:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        for sql in GUARDED_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_indexchange'),
+    ]
+
+    operations = [
+        migrations.RunPython(guard_triggers, migrations.RunPython.noop),
+    ]
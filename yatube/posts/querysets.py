@@ -0,0 +1,23 @@
+from .models import Post
+
+FEED_FIELDS = (
+    'text',
+    'pub_date',
+    'modified',
+    'image',
+    'image_width',
+    'image_height',
+    'image_placeholder',
+    'comments_count',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group__title',
+    'group__slug',
+)
+
+
+def feed_posts(queryset=None):
+    if queryset is None:
+        queryset = Post.objects.all()
+    return queryset.select_related('author', 'group').only(*FEED_FIELDS)
@@ -0,0 +1,82 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from .querysets import feed_posts
+
+SEARCH_TABLE = 'posts_post_search'
+TEXT_COLUMN = 0
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_TOKENS = 24
+TERM_RE = re.compile(r'\w+')
+WEIGHTS = (4.0, 1.0, 1.0)
+
+_available = None
+
+
+def search_available():
+    global _available
+    if _available is None:
+        _available = (
+            connection.vendor == 'sqlite'
+            and SEARCH_TABLE in connection.introspection.table_names()
+        )
+    return _available
+
+
+def match_expression(query):
+    terms = TERM_RE.findall(query)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def matching_ids(query):
+    return RawSQL(
+        f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+        (match_expression(query),)
+    )
+
+
+def search_posts(query):
+    posts = feed_posts()
+    if not match_expression(query):
+        return posts.none()
+    if not search_available():
+        return posts.filter(
+            Q(text__icontains=query)
+            | Q(author__username__icontains=query)
+            | Q(group__title__icontains=query)
+        ).order_by('-pub_date')
+    weights = ', '.join(map(str, WEIGHTS))
+    return posts.extra(
+        tables=[SEARCH_TABLE],
+        where=[
+            f'{SEARCH_TABLE}.rowid = posts_post.id',
+            f'{SEARCH_TABLE} MATCH %s',
+        ],
+        params=[match_expression(query)],
+        select={
+            'search_rank': f'bm25({SEARCH_TABLE}, {weights})',
+            'snippet': (
+                f"snippet({SEARCH_TABLE}, {TEXT_COLUMN}, '{MARK_START}', "
+                f"'{MARK_END}', '…', {SNIPPET_TOKENS})"
+            ),
+        },
+        order_by=['search_rank', '-pub_date'],
+    )
+
+
+def highlight(post):
+    snippet = getattr(post, 'snippet', None)
+    if snippet is None:
+        snippet = Truncator(post.text).words(SNIPPET_TOKENS)
+    return mark_safe(
+        escape(snippet).replace(MARK_START, '<mark>').replace(
+            MARK_END, '</mark>'
+        )
+    )
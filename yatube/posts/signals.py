@@ -0,0 +1,415 @@
+import threading
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import autocomplete, caching, counts, tags, timeline
+from .counters import bump, bump_many, bump_user, reconcile
+from .images import DECODE_ERRORS, read_image
+from .models import (Comment, Follow, Group, Post, PostTag, Tag, User,
+                     UserCounters)
+
+_deleting = threading.local()
+
+USER_NAME_FIELDS = ('username', 'first_name', 'last_name')
+GROUP_NAME_FIELDS = ('title', 'slug')
+
+
+def adjust_counts_on_commit(feeds, delta):
+    def adjust():
+        for feed in feeds:
+            counts.adjust_count(feed, delta)
+    transaction.on_commit(adjust)
+
+
+def deleting(kind):
+    """Ключи постов или пользователей, удаляемых в этом потоке.
+
+    В Django 2.2 у сигналов удаления нет origin, но все pre_delete
+    каскада приходят раньше всех post_delete. Удаляемые строки
+    помечаются в pre_delete, и post_delete зависимых строк их видит.
+    """
+    if not hasattr(_deleting, kind):
+        setattr(_deleting, kind, set())
+    return getattr(_deleting, kind)
+
+
+def cascaded_post(post_id):
+    return post_id in deleting('posts')
+
+
+def cascaded_user(*user_ids):
+    return not deleting('users').isdisjoint(user_ids)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_group(sender, instance, raw, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_text = None
+    if instance.pk is not None and not raw:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'text'
+        ).first()
+        if previous is not None:
+            (
+                instance._previous_group_id,
+                instance._previous_text,
+            ) = previous
+
+
+@receiver(pre_save, sender=Post)
+def describe_uploaded_image(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    if not instance.image:
+        instance.image_width = instance.image_height = None
+        instance.image_placeholder = ''
+    elif not instance.image._committed:
+        file_ = instance.image.file
+        metadata = getattr(file_, 'image_metadata', None)
+        if metadata is None:
+            try:
+                metadata = read_image(file_)
+            except DECODE_ERRORS:
+                metadata = (None, None, '')
+        (
+            instance.image_width,
+            instance.image_height,
+            instance.image_placeholder,
+        ) = metadata
+
+
+@receiver(post_save, sender=User)
+def create_user_counters(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def bump_post_counters(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        bump_user(instance.author_id, posts_count=1)
+        if instance.group_id is not None:
+            bump(Group, instance.group_id, posts_count=1)
+        return
+    if instance._previous_group_id != instance.group_id:
+        if instance._previous_group_id is not None:
+            bump(Group, instance._previous_group_id, posts_count=-1)
+        if instance.group_id is not None:
+            bump(Group, instance.group_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def drop_post_counters(sender, instance, **kwargs):
+    if cascaded_user(instance.author_id):
+        return
+    bump_user(instance.author_id, create_missing=False, posts_count=-1)
+    if instance.group_id is not None:
+        bump(Group, instance.group_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def bump_comment_counters(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        bump(Post, instance.post_id, comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def drop_comment_counters(sender, instance, **kwargs):
+    if cascaded_post(instance.post_id) or cascaded_user(instance.author_id):
+        return
+    bump(Post, instance.post_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def bump_follow_counters(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        bump_user(instance.author_id, followers_count=1)
+        bump_user(instance.user_id, followings_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def drop_follow_counters(sender, instance, **kwargs):
+    if cascaded_user(instance.user_id, instance.author_id):
+        return
+    bump_user(instance.author_id, create_missing=False, followers_count=-1)
+    bump_user(instance.user_id, create_missing=False, followings_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        adjust_counts_on_commit(
+            counts.post_feeds(instance.author_id, instance.group_id), 1
+        )
+        timeline.fan_out(instance)
+        return
+    previous_group_id = instance._previous_group_id
+    if previous_group_id != instance.group_id:
+        if previous_group_id is not None:
+            adjust_counts_on_commit(
+                [counts.feed_key('group', previous_group_id)], -1
+            )
+        if instance.group_id is not None:
+            adjust_counts_on_commit(
+                [counts.feed_key('group', instance.group_id)], 1
+            )
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    if cascaded_user(instance.author_id):
+        return
+    adjust_counts_on_commit(
+        counts.post_feeds(instance.author_id, instance.group_id), -1
+    )
+
+
+@receiver(post_delete, sender=Group)
+def forget_group_count(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: counts.forget_count(counts.feed_key('group', instance.pk))
+    )
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    feeds = counts.post_feeds(instance.author_id, instance.group_id)
+    feeds.append(counts.feed_key('post', instance.pk))
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id not in (None, instance.group_id):
+        feeds.append(counts.feed_key('group', previous_group_id))
+    caching.invalidate_feeds(feeds)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    if cascaded_user(instance.author_id):
+        return
+    feeds = counts.post_feeds(instance.author_id, instance.group_id)
+    feeds.append(counts.feed_key('post', instance.pk))
+    caching.invalidate_feeds(feeds)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post(sender, instance, signal, **kwargs):
+    if kwargs.get('raw'):
+        return
+    if signal is post_delete and (
+        cascaded_post(instance.post_id) or cascaded_user(instance.author_id)
+    ):
+        return
+    post = Post.objects.filter(pk=instance.post_id).values(
+        'author_id', 'group_id'
+    ).first()
+    feeds = [counts.feed_key('post', instance.post_id)]
+    if post is not None:
+        feeds.extend(counts.post_feeds(post['author_id'], post['group_id']))
+    caching.invalidate_feeds(feeds)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_profiles(sender, instance, **kwargs):
+    if not kwargs.get('raw') and not cascaded_user(
+        instance.user_id, instance.author_id
+    ):
+        caching.invalidate_feeds([
+            counts.feed_key('profile', instance.author_id),
+            counts.feed_key('profile', instance.user_id),
+        ])
+
+
+def previous_names(model, instance, fields, update_fields):
+    if instance.pk is None:
+        return None
+    if update_fields is not None and not update_fields & set(fields):
+        return None
+    return model.objects.filter(pk=instance.pk).values_list(*fields).first()
+
+
+def names_changed(instance, fields):
+    previous = getattr(instance, '_previous_names', None)
+    return previous is not None and previous != tuple(
+        getattr(instance, field) for field in fields
+    )
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Group)
+def remember_previous_names(sender, instance, raw, update_fields, **kwargs):
+    fields = USER_NAME_FIELDS if sender is User else GROUP_NAME_FIELDS
+    instance._previous_names = None if raw else previous_names(
+        sender, instance, fields, update_fields
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    feeds = [counts.feed_key('group', instance.pk)]
+    if kwargs['signal'] is post_delete or names_changed(
+        instance, GROUP_NAME_FIELDS
+    ):
+        feeds.append(counts.FEED_NAMES)
+    caching.invalidate_feeds(feeds)
+
+
+@receiver(post_save, sender=User)
+def invalidate_profile_pages(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    feeds = [counts.feed_key('profile', instance.pk)]
+    if names_changed(instance, USER_NAME_FIELDS):
+        feeds.append(counts.FEED_NAMES)
+    caching.invalidate_feeds(feeds)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def refresh_user_autocomplete(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not update_fields & set(
+        USER_NAME_FIELDS
+    ):
+        return
+    if not kwargs.get('raw'):
+        autocomplete.refresh_on_commit('users', instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def refresh_group_autocomplete(sender, instance, **kwargs):
+    if not kwargs.get('raw'):
+        autocomplete.refresh_on_commit('groups', instance.pk)
+
+
+def tag_feeds(tag_ids):
+    return [counts.feed_key('tag', pk) for pk in tag_ids]
+
+
+@receiver(post_save, sender=Post)
+def update_post_tags(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created or instance._previous_text != instance.text:
+        current, removed, added = tags.sync_tags(instance, created)
+        adjust_counts_on_commit(tag_feeds(removed), -1)
+        adjust_counts_on_commit(tag_feeds(added), 1)
+        current.update(added)
+    else:
+        current = tags.post_tag_ids(instance)
+    caching.invalidate_feeds(tag_feeds(current))
+
+
+@receiver(post_delete, sender=Post)
+def drop_post_tags(sender, instance, **kwargs):
+    if cascaded_user(instance.author_id):
+        return
+    tag_ids = tags.text_tag_ids(instance.text)
+    if tag_ids:
+        bump_many(Tag, tag_ids, posts_count=-1)
+        adjust_counts_on_commit(tag_feeds(tag_ids), -1)
+        caching.invalidate_feeds(tag_feeds(tag_ids))
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    if not cascaded_user(instance.user_id, instance.author_id):
+        timeline.prune(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def mark_deleted_post(sender, instance, **kwargs):
+    deleting('posts').add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unmark_deleted_post(sender, instance, **kwargs):
+    deleting('posts').discard(instance.pk)
+
+
+def totals(queryset, field):
+    return dict(queryset.order_by().values(field).annotate(
+        total=Count('pk')
+    ).values_list(field, 'total'))
+
+
+@receiver(pre_delete, sender=User)
+def collect_deleted_user(sender, instance, **kwargs):
+    deleting('users').add(instance.pk)
+    posts = Post.objects.filter(author=instance)
+    instance._deleted_posts = list(posts.values_list('pk', flat=True))
+    instance._deleted_groups = totals(
+        posts.exclude(group=None), 'group_id'
+    )
+    instance._deleted_tags = totals(
+        PostTag.objects.filter(post__author=instance), 'tag_id'
+    )
+    instance._commented_posts = list(
+        Comment.objects.filter(author=instance).exclude(
+            post__author=instance
+        ).order_by().values_list(
+            'post_id', 'post__author_id', 'post__group_id'
+        ).distinct()
+    )
+    instance._follow_peers = {
+        peer
+        for pair in Follow.objects.filter(
+            Q(user=instance) | Q(author=instance)
+        ).values_list('user_id', 'author_id')
+        for peer in pair
+    } - {instance.pk}
+
+
+@receiver(post_delete, sender=User)
+def drop_deleted_user(sender, instance, **kwargs):
+    deleting('users').discard(instance.pk)
+    posts = instance._deleted_posts
+    author_feed = counts.feed_key('author', instance.pk)
+    feeds = [author_feed, counts.feed_key('profile', instance.pk)]
+    if posts:
+        adjust_counts_on_commit([counts.FEED_ALL], -len(posts))
+        feeds.append(counts.FEED_ALL)
+        feeds.extend(counts.feed_key('post', pk) for pk in posts)
+    for group_id, total in instance._deleted_groups.items():
+        bump(Group, group_id, posts_count=-total)
+        group_feeds = [counts.feed_key('group', group_id)]
+        adjust_counts_on_commit(group_feeds, -total)
+        feeds.extend(group_feeds)
+    for tag_id, total in instance._deleted_tags.items():
+        bump(Tag, tag_id, posts_count=-total)
+        adjust_counts_on_commit(tag_feeds([tag_id]), -total)
+        feeds.extend(tag_feeds([tag_id]))
+    commented = instance._commented_posts
+    if commented:
+        reconcile(Post, [post_id for post_id, _, _ in commented])
+    for post_id, author_id, group_id in commented:
+        feeds.append(counts.feed_key('post', post_id))
+        feeds.extend(counts.post_feeds(author_id, group_id))
+    peers = list(User.objects.filter(
+        pk__in=instance._follow_peers
+    ).values_list('pk', flat=True)) if instance._follow_peers else []
+    if peers:
+        reconcile(UserCounters, peers)
+        feeds.extend(counts.feed_key('profile', peer) for peer in peers)
+    caching.invalidate_feeds(feeds)
+    transaction.on_commit(lambda: counts.forget_count(author_feed))
@@ -0,0 +1,89 @@
+import re
+import unicodedata
+
+from django.urls import reverse
+from django.utils.html import escape, format_html
+from django.utils.safestring import mark_safe
+
+from .counters import bump_many
+from .models import PostTag, Tag
+
+TAG_RE = re.compile(r'(?<![\w#&])#(\w+)')
+TAG_MAX_LENGTH = Tag._meta.get_field('name').max_length
+
+
+def normalize_tag(name):
+    return unicodedata.normalize('NFKC', name).casefold()
+
+
+def extract_tags(text):
+    return {
+        name for name in map(normalize_tag, TAG_RE.findall(text))
+        if len(name) <= TAG_MAX_LENGTH
+    }
+
+
+def tag_ids(names):
+    ids = dict(Tag.objects.filter(name__in=names).values_list('name', 'pk'))
+    missing = [name for name in names if name not in ids]
+    if missing:
+        Tag.objects.bulk_create(
+            (Tag(name=name) for name in missing), ignore_conflicts=True
+        )
+        ids.update(
+            Tag.objects.filter(name__in=missing).values_list('name', 'pk')
+        )
+    return ids
+
+
+def text_tag_ids(text):
+    names = extract_tags(text)
+    if not names:
+        return set()
+    return set(
+        Tag.objects.filter(name__in=names).values_list('pk', flat=True)
+    )
+
+
+def post_tag_ids(post):
+    return set(PostTag.objects.filter(post=post).values_list(
+        'tag_id', flat=True
+    ))
+
+
+def sync_tags(post, created=False):
+    wanted = extract_tags(post.text)
+    current = {} if created else dict(
+        PostTag.objects.filter(post=post).values_list('tag__name', 'tag_id')
+    )
+    removed = [pk for name, pk in current.items() if name not in wanted]
+    added_names = wanted - current.keys()
+    added = list(tag_ids(added_names).values()) if added_names else []
+    if removed:
+        PostTag.objects.filter(post=post, tag_id__in=removed).delete()
+        bump_many(Tag, removed, posts_count=-1)
+    if added:
+        PostTag.objects.bulk_create(
+            PostTag(post=post, tag_id=pk, pub_date=post.pub_date)
+            for pk in added
+        )
+        bump_many(Tag, added, posts_count=1)
+    return set(current.values()), removed, added
+
+
+def link_tags(text):
+    parts = []
+    position = 0
+    for match in TAG_RE.finditer(text):
+        name = normalize_tag(match.group(1))
+        if len(name) > TAG_MAX_LENGTH:
+            continue
+        parts.append(escape(text[position:match.start()]))
+        parts.append(format_html(
+            '<a href="{}">{}</a>',
+            reverse('posts:tag', kwargs={'name': name}),
+            match.group()
+        ))
+        position = match.end()
+    parts.append(escape(text[position:]))
+    return mark_safe(''.join(parts))
@@ -0,0 +1,40 @@
+from django import template
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts.caching import cached_card
+from posts.search import highlight as get_highlight
+from posts.tags import link_tags
+from posts.utils import ELLIPSIS
+from posts.utils import elided_page_range as get_elided_page_range
+
+
+register = template.Library()
+
+
+@register.filter
+def elided_page_range(page_obj):
+    return get_elided_page_range(page_obj)
+
+
+@register.simple_tag
+def page_ellipsis():
+    return ELLIPSIS
+
+
+@register.filter
+def highlight(post):
+    return get_highlight(post)
+
+
+@register.filter
+def tag_links(text):
+    return link_tags(text)
+
+
+@register.simple_tag
+def post_card(post):
+    return mark_safe(cached_card(
+        post,
+        lambda: render_to_string('includes/post_card.html', {'post': post})
+    ))
@@ -0,0 +1,23 @@
+from urllib.parse import urlsplit
+
+from django.db import connection
+from django.urls import resolve
+
+from ..budget import QueryLog, view_budget
+
+
+class QueryBudgetMixin:
+    def assertQueryBudget(self, url, client=None, data=None):
+        """Проверяет, что GET-запрос укладывается в бюджет вьюхи."""
+        client = client or self.client
+        budget = view_budget(resolve(urlsplit(url).path).func)
+        self.assertIsNotNone(budget, f'У {url} не задан бюджет запросов')
+        log = QueryLog(with_stacks=True)
+        with connection.execute_wrapper(log):
+            response = client.get(url, data)
+        self.assertLessEqual(
+            len(log), budget,
+            f'{url}: {len(log)} запросов при бюджете {budget}\n'
+            f'{log.report()}'
+        )
+        return response
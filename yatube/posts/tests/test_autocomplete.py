@@ -0,0 +1,166 @@
+import sys
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from .. import autocomplete
+from ..forms import PostForm
+from ..models import Group, IndexChange, Post
+
+User = get_user_model()
+
+
+class PrefixIndexTests(TransactionTestCase):
+    def test_search(self):
+        """Поиск по префиксу без дублей и с ограничением."""
+        index = autocomplete.PrefixIndex([
+            (1, ['python', 'py'], 'Python'),
+            (2, ['pytest'], 'pytest'),
+            (3, ['django'], 'Django'),
+        ])
+        self.assertEqual(index.search('Py', 10), ['Python', 'pytest'])
+        self.assertEqual(index.search('py', 1), ['Python'])
+        self.assertEqual(index.search('x', 10), [])
+        index.add(4, ['pyramid'], 'Pyramid')
+        index.remove(1)
+        self.assertEqual(index.search('py', 10), ['Pyramid', 'pytest'])
+
+    def test_search_during_updates(self):
+        """Поиск из другого потока не падает, пока индекс меняется."""
+        index = autocomplete.PrefixIndex(
+            (pk, [f'user{pk}'], pk) for pk in range(200)
+        )
+        errors = []
+        stop = threading.Event()
+
+        def search():
+            while not stop.is_set():
+                try:
+                    index.search('user', 200)
+                except KeyError as error:
+                    errors.append(error)
+                    return
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        reader = threading.Thread(target=search)
+        reader.start()
+        try:
+            for _ in range(1000):
+                for pk in range(0, 200, 7):
+                    index.remove(pk)
+                    index.add(pk, [f'user{pk}'], pk)
+        finally:
+            stop.set()
+            reader.join()
+            sys.setswitchinterval(interval)
+        self.assertEqual(errors, [])
+
+
+class AutocompleteTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        autocomplete._indexes.clear()
+        self.user = User.objects.create_user(
+            username='Leo', first_name='Лев', last_name='Толстой'
+        )
+        self.group = Group.objects.create(
+            title='Классика', slug='classics', description='Описание'
+        )
+        Group.objects.create(title='Поэзия', slug='poetry', description='')
+        self.client = Client()
+
+    def results(self, kind, query):
+        response = self.client.get(
+            reverse('posts:autocomplete', kwargs={'kind': kind}),
+            {'q': query}
+        )
+        return response.json()['results']
+
+    def test_groups_by_title_and_slug(self):
+        """Группы находятся по началу названия и слага."""
+        expected = [{'id': self.group.pk, 'text': 'Классика'}]
+        self.assertEqual(self.results('groups', 'КЛА'), expected)
+        self.assertEqual(self.results('groups', 'class'), expected)
+
+    def test_users_by_username(self):
+        """Пользователи находятся по началу имени пользователя."""
+        self.assertEqual(
+            self.results('users', 'le'), [{'id': 'Leo', 'text': 'Leo'}]
+        )
+
+    def test_full_names_only_for_logged_in(self):
+        """Полные имена видны только вошедшим пользователям."""
+        self.client.force_login(self.user)
+        self.assertEqual(
+            self.results('users', 'le'),
+            [{'id': 'Leo', 'text': 'Leo (Лев Толстой)'}]
+        )
+
+    def test_unknown_kind(self):
+        """Неизвестный тип подсказок отдаёт 404."""
+        response = self.client.get(
+            reverse('posts:autocomplete', kwargs={'kind': 'posts'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(AUTOCOMPLETE_SYNC_INTERVAL=60)
+    def test_lookup_uses_loaded_index(self):
+        """Подсказки отдаются из памяти без запросов к базе."""
+        self.results('groups', 'к')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.results('groups', 'п')), 1)
+
+    def test_index_is_updated_incrementally(self):
+        """Изменения групп попадают в загруженный индекс без перезагрузки."""
+        index = autocomplete.get_index('groups')
+        Group.objects.create(title='Проза', slug='prose', description='')
+        self.group.title = 'Романы'
+        self.group.save()
+        self.assertIs(autocomplete.get_index('groups'), index)
+        self.assertEqual(
+            [result['text'] for result in self.results('groups', 'п')],
+            ['Поэзия', 'Проза']
+        )
+        self.assertEqual(self.results('groups', 'кла'), [])
+        self.assertEqual(len(self.results('groups', 'class')), 1)
+
+    @override_settings(AUTOCOMPLETE_SYNC_INTERVAL=0)
+    def test_other_process_changes_are_applied(self):
+        """Изменения из другого процесса применяются без перезагрузки."""
+        index = autocomplete.get_index('users')
+        User.objects.filter(pk=self.user.pk).update(username='Lermontov')
+        IndexChange.objects.create(kind='users', object_id=self.user.pk)
+        self.assertIs(autocomplete.get_index('users'), index)
+        self.assertEqual(self.results('users', 'le'), [
+            {'id': 'Lermontov', 'text': 'Lermontov'}
+        ])
+
+    def test_idle_index_is_reloaded(self):
+        """Индекс, отставший дольше хранения журнала, строится заново."""
+        index = autocomplete.get_index('users')
+        with override_settings(AUTOCOMPLETE_CHANGES_RETENTION=-1):
+            self.assertIsNot(autocomplete.get_index('users'), index)
+
+    def test_login_keeps_index(self):
+        """Вход пользователя не сбрасывает индекс."""
+        index = autocomplete.get_index('users')
+        self.client.force_login(self.user)
+        self.assertIs(autocomplete.get_index('users'), index)
+
+    def test_form_renders_only_selected_group(self):
+        """Форма выводит только выбранную группу."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group
+        )
+        with self.assertNumQueries(1):
+            html = str(PostForm(instance=post)['group'])
+        self.assertIn('Классика', html)
+        self.assertNotIn('Поэзия', html)
+        self.assertIn('data-autocomplete-url="/autocomplete/groups/"', html)
+        form = PostForm(data={'text': 'Пост', 'group': 'abc'})
+        self.assertFalse(form.is_valid())
+        str(form['group'])
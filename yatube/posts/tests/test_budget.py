@@ -0,0 +1,91 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import views
+from ..models import Comment, Follow, Group, Post
+from .helpers import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for i in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text=f'#тег Пост {i}',
+                image='posts/missing.jpg',
+            )
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text='Коммент'
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_read_views_fit_budget(self):
+        """Страницы укладываются в объявленный бюджет запросов."""
+        urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:tag', kwargs={'name': 'тег'}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:comments', kwargs={'post_id': self.post.pk}),
+            reverse('posts:followings'),
+            reverse('posts:search') + '?q=пост',
+            reverse('posts:post_create'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertQueryBudget(url)
+
+    def test_edit_fits_budget(self):
+        """Страница редактирования укладывается в бюджет."""
+        self.client.force_login(self.author)
+        self.assertQueryBudget(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+        )
+
+    def test_cards_do_not_query_authors_and_groups(self):
+        """Карточки ленты не дочитывают авторов и группы."""
+        self.client.logout()
+        response = self.assertQueryBudget(reverse('posts:main_page'))
+        self.assertContains(response, 'Имя Фамилия', count=10)
+        self.assertContains(response, 'все записи группы Группа', count=10)
+
+    @override_settings(QUERY_BUDGET_CHECK=True)
+    def test_middleware_logs_violations(self):
+        """Отладочный middleware пишет превышения бюджета со стеком."""
+        client = Client()
+        client.force_login(self.reader)
+        with mock.patch.object(views.index, 'query_budget', 1):
+            with self.assertLogs('posts.budget', 'WARNING') as logs:
+                client.get(reverse('posts:main_page'))
+        self.assertIn('over a budget of 1', logs.output[0])
+        self.assertIn('views.py', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_CHECK=False)
+    def test_middleware_is_optional(self):
+        """Без настройки middleware не подключается."""
+        client = Client()
+        with mock.patch.object(views.index, 'query_budget', 0):
+            with mock.patch('posts.budget.logger.warning') as warning:
+                client.get(reverse('posts:main_page'))
+        warning.assert_not_called()
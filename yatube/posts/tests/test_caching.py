@@ -0,0 +1,395 @@
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.template.loader import render_to_string
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from core.metrics import registry
+
+from ..caching import card_cache_stats, feed_generation
+from ..counts import FEED_ALL, FEED_NAMES, feed_key
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class FeedCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test-user')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Другое описание',
+        )
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Тестовый пост',
+            group=self.group
+        )
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get_posts(self, url):
+        return list(self.client.get(url).context['page_obj'].object_list)
+
+    def test_page_is_served_from_cache(self):
+        """Повторный запрос страницы ленты не выбирает посты из базы."""
+        url = reverse('posts:main_page')
+        self.get_posts(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Изменённый пост')
+        self.assertEqual(self.get_posts(url)[0].text, 'Тестовый пост')
+
+    def test_writes_invalidate_pages(self):
+        """Создание, правка и удаление поста сбрасывают закэшированные
+        страницы."""
+        urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+        for url in urls:
+            self.get_posts(url)
+        new_post = Post.objects.create(
+            author=self.user,
+            text='Новый пост',
+            group=self.group
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertIn(new_post, self.get_posts(url))
+        new_post.text = 'Отредактированный пост'
+        new_post.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.get_posts(url)[0].text, 'Отредактированный пост'
+                )
+        new_post.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.get_posts(url), [self.post])
+
+    def test_renames_invalidate_pages(self):
+        """Смена имени автора и названия группы сбрасывает ленты."""
+        url = reverse('posts:main_page')
+        self.get_posts(url)
+        self.user.last_name = 'Новая'
+        self.user.save()
+        self.assertEqual(self.get_posts(url)[0].author.last_name, 'Новая')
+        self.group.title = 'Новая группа'
+        self.group.save()
+        self.assertEqual(self.get_posts(url)[0].group.title, 'Новая группа')
+        self.group.delete()
+        self.assertIsNone(self.get_posts(url)[0].group)
+
+    def test_login_keeps_pages(self):
+        """Правки без смены имени не сбрасывают ленты."""
+        before = feed_generation(FEED_NAMES)
+        self.user.save(update_fields=['last_login'])
+        self.user.email = 'user@example.com'
+        self.user.save()
+        self.assertEqual(feed_generation(FEED_NAMES), before)
+
+    def test_group_change_invalidates_both_groups(self):
+        """Перенос поста в другую группу сбрасывает обе ленты групп."""
+        feeds = (
+            feed_key('group', self.group.pk),
+            feed_key('group', self.other_group.pk),
+        )
+        before = [feed_generation(feed) for feed in feeds]
+        self.post.group = self.other_group
+        self.post.save()
+        after = [feed_generation(feed) for feed in feeds]
+        for old, new in zip(before, after):
+            self.assertNotEqual(old, new)
+
+    def test_comment_invalidates_post_feeds(self):
+        """Комментарий сбрасывает только ленты, где показан пост."""
+        untouched = feed_key('group', self.other_group.pk)
+        feeds = (FEED_ALL, feed_key('group', self.group.pk), untouched)
+        before = {feed: feed_generation(feed) for feed in feeds}
+        Comment.objects.create(
+            post=self.post,
+            author=self.user,
+            text='Комментарий'
+        )
+        self.assertNotEqual(feed_generation(FEED_ALL), before[FEED_ALL])
+        self.assertEqual(feed_generation(untouched), before[untouched])
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test-author')
+        cls.reader = User.objects.create_user(username='test-reader')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Тестовый пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.factory = RequestFactory()
+
+    def render(self, user, post=None):
+        request = self.factory.get('/')
+        request.user = user
+        return render_to_string(
+            'includes/post.html',
+            {'post': post or self.post},
+            request=request
+        )
+
+    def test_card_is_rendered_once(self):
+        """Карточка поста рендерится один раз и дальше берётся из кэша."""
+        self.render(self.reader)
+        self.render(self.reader)
+        stats = card_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_stats_command_reads_metrics_dir(self):
+        """Команда читает счётчики серверных процессов из METRICS_DIR."""
+        metrics_dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, metrics_dir, ignore_errors=True)
+        with override_settings(METRICS_DIR=metrics_dir):
+            self.render(self.reader)
+            self.render(self.reader)
+            out = StringIO()
+            call_command('card_cache_stats', stdout=out)
+        self.assertIn('попаданий 1, промахов 1', out.getvalue())
+
+    def test_stats_command_needs_metrics_dir(self):
+        """Без METRICS_DIR команда не выдаёт пустую статистику."""
+        with override_settings(METRICS_DIR=None):
+            with self.assertRaisesMessage(CommandError, '/metrics'):
+                call_command('card_cache_stats')
+
+    def test_edit_link_is_not_cached(self):
+        """Ссылка на редактирование видна только автору поста."""
+        edit_url = reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+        self.assertIn(edit_url, self.render(self.author))
+        self.assertNotIn(edit_url, self.render(self.reader))
+        self.assertEqual(card_cache_stats()['hits'], 1)
+
+    def test_edit_renders_new_card(self):
+        """После правки поста карточка рендерится заново."""
+        self.render(self.reader)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Отредактированный пост'
+        post.save()
+        self.assertIn('Отредактированный пост', self.render(self.reader, post))
+        self.assertEqual(card_cache_stats()['misses'], 2)
+
+    def test_renamed_author_renders_new_card(self):
+        """Смена имени автора не отдаёт устаревшую карточку."""
+        self.render(self.reader)
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Новое'
+        author.last_name = 'Имя'
+        author.save()
+        post = Post.objects.select_related('author').get(pk=self.post.pk)
+        self.assertIn('Новое Имя', self.render(self.reader, post))
+        self.assertEqual(card_cache_stats()['misses'], 2)
+
+
+class AnonymousPageCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='test-author')
+        self.reader = User.objects.create_user(username='test-reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            author=self.author,
+            text='Тестовый пост',
+            group=self.group
+        )
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        self.urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse(
+                'posts:profile', kwargs={'username': self.author.username}
+            ),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_anonymous_pages_are_cached(self):
+        """Повторный анонимный запрос отдаётся без обращения к базе."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertEqual(first.content, second.content)
+
+    def test_renames_invalidate_pages(self):
+        """Смена имени автора сбрасывает анонимный кэш страниц."""
+        for url in self.urls:
+            self.guest_client.get(url)
+        self.author.first_name = 'Новое'
+        self.author.last_name = 'Имя'
+        self.author.save()
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Новое Имя')
+
+    def test_authorized_pages_are_not_cached(self):
+        """Запросы с сессией идут мимо кэша страниц."""
+        url = reverse('posts:main_page')
+        self.authorized_client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertIsNotNone(response.context)
+
+    def test_cache_varies_on_page(self):
+        """Разные страницы ленты кэшируются отдельно."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}') for i in range(10)
+        )
+        cache.clear()
+        url = reverse('posts:main_page')
+        first = self.guest_client.get(url)
+        second = self.guest_client.get(url, {'page': 2})
+        self.assertNotEqual(first.content, second.content)
+        self.assertContains(second, 'Тестовый пост')
+
+    def test_writes_invalidate_pages(self):
+        """Записи сбрасывают кэш затронутых страниц."""
+        detail_url = self.urls[3]
+        profile_url = self.urls[2]
+        self.guest_client.get(detail_url)
+        self.guest_client.get(profile_url)
+        Comment.objects.create(
+            post=self.post,
+            author=self.reader,
+            text='Свежий комментарий'
+        )
+        self.assertContains(
+            self.guest_client.get(detail_url), 'Свежий комментарий'
+        )
+        self.authorized_client.get(
+            reverse('posts:follow', kwargs={'username': self.author.username})
+        )
+        self.assertContains(
+            self.guest_client.get(profile_url), 'Подписчиков: 1'
+        )
+
+
+class ConditionalGetTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='test-author')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            author=self.author,
+            text='Тестовый пост',
+            group=self.group
+        )
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse(
+                'posts:profile', kwargs={'username': self.author.username}
+            ),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_pages_send_validators(self):
+        """Страницы ленты и поста отдают ETag и Last-Modified."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('ETag'))
+                self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_matching_etag_returns_304_without_rendering(self):
+        """Совпавший ETag даёт 304 без рендеринга страницы."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+
+    def test_matching_last_modified_returns_304(self):
+        """Неизменившаяся страница отвечает 304 на If-Modified-Since."""
+        url = self.urls[0]
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_change_etag(self):
+        """Комментарий и удаление поста меняют ETag страниц."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        Comment.objects.create(
+            post=self.post,
+            author=self.author,
+            text='Комментарий'
+        )
+        response = self.client.get(
+            self.urls[3], HTTP_IF_NONE_MATCH=etags[self.urls[3]]
+        )
+        self.assertEqual(response.status_code, 200)
+        Post.objects.create(author=self.author, text='Другой пост').delete()
+        for url in (self.urls[0], self.urls[2]):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+
+    def test_rename_changes_etag(self):
+        """Смена имени автора меняет ETag и Last-Modified страниц."""
+        responses = {url: self.client.get(url) for url in self.urls}
+        time.sleep(1)
+        self.author.last_name = 'Новая'
+        self.author.save()
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                ).status_code, 200)
+                self.assertEqual(self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                ).status_code, 200)
+
+    def test_etag_depends_on_viewer(self):
+        """У разных посетителей разные ETag."""
+        url = self.urls[0]
+        guest_etag = Client().get(url)['ETag']
+        self.assertNotEqual(self.client.get(url)['ETag'], guest_etag)
+
+    def test_cached_anonymous_page_returns_304(self):
+        """Закэшированная анонимная страница тоже отвечает 304."""
+        guest_client = Client()
+        url = self.urls[0]
+        etag = guest_client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
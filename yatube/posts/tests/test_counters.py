@@ -0,0 +1,156 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, Tag, UserCounters
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Другое описание',
+        )
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Счётчики постов автора и группы следуют за постами."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group
+        )
+        self.assertEqual(self.counters(self.user).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.counters(self.user).posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_comment_counter(self):
+        """Счётчик комментариев поста следует за комментариями."""
+        post = Post.objects.create(author=self.user, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Коммент'
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Счётчики подписчиков и подписок следуют за подписками."""
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        self.assertEqual(self.counters(self.user).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).followings_count, 1)
+        follow.delete()
+        self.assertEqual(self.counters(self.user).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).followings_count, 0)
+
+    def delete_queries(self, instance):
+        with CaptureQueriesContext(connection) as queries:
+            instance.delete()
+        return len(queries)
+
+    def test_post_delete_skips_cascaded_comments(self):
+        """Удаление поста не обрабатывает его комментарии по одному."""
+        queries = []
+        for comments in (1, 5):
+            post = Post.objects.create(author=self.user, text='Пост')
+            for _ in range(comments):
+                Comment.objects.create(
+                    post=post, author=self.reader, text='Коммент'
+                )
+            queries.append(self.delete_queries(post))
+        self.assertEqual(queries[0], queries[1])
+        self.assertEqual(self.counters(self.user).posts_count, 0)
+
+    def test_user_delete_adjusts_counters_once(self):
+        """Удаление автора пересчитывает чужие счётчики одним проходом."""
+        other = Post.objects.create(author=self.reader, text='Чужой пост')
+        queries = []
+        for posts in (1, 4):
+            author = User.objects.create_user(username=f'author-{posts}')
+            for _ in range(posts):
+                post = Post.objects.create(
+                    author=author, text='Пост #тег', group=self.group
+                )
+                Comment.objects.create(
+                    post=post, author=self.reader, text='Коммент'
+                )
+                Comment.objects.create(
+                    post=other, author=author, text='Коммент'
+                )
+            Follow.objects.create(user=self.reader, author=author)
+            Follow.objects.create(user=author, author=self.user)
+            queries.append(self.delete_queries(author))
+        self.assertEqual(queries[0], queries[1])
+        other.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(other.comments_count, 0)
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(Tag.objects.get(name='тег').posts_count, 0)
+        self.assertEqual(self.counters(self.reader).followings_count, 0)
+        self.assertEqual(self.counters(self.user).followers_count, 0)
+
+    def test_reconcile_fixes_drift(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Коммент')
+        Follow.objects.create(user=self.reader, author=self.user)
+        UserCounters.objects.filter(user=self.user).update(
+            posts_count=7, followers_count=0
+        )
+        UserCounters.objects.filter(user=self.reader).delete()
+        Group.objects.update(posts_count=5)
+        Post.objects.update(comments_count=3)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        user_counters = self.counters(self.user)
+        self.assertEqual(user_counters.posts_count, 1)
+        self.assertEqual(user_counters.followers_count, 1)
+        self.assertEqual(self.counters(self.reader).followings_count, 1)
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        post.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.other_group.posts_count, 0)
+        self.assertEqual(post.comments_count, 1)
+
+    def test_post_detail_does_not_count_rows(self):
+        """Страница поста не считает посты автора запросом COUNT."""
+        post = Post.objects.create(author=self.user, text='Пост')
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(
+                reverse('posts:post_detail', kwargs={'post_id': post.id})
+            )
+        self.assertContains(response, 'Всего постов автора: 1')
+        self.assertFalse(
+            any('COUNT(' in query['sql'].upper() for query in queries)
+        )
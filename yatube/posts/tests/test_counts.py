@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from ..counts import FEED_ALL, count_or_estimate, feed_count, feed_key
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class FeedCountTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test-user')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Другое описание',
+        )
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Тестовый пост',
+            group=self.group
+        )
+        self.feeds = {
+            FEED_ALL: Post.objects.all(),
+            feed_key('author', self.user.pk): self.user.posts.all(),
+            feed_key('group', self.group.pk): self.group.posts.all(),
+            feed_key('group', self.other_group.pk): (
+                self.other_group.posts.all()
+            ),
+        }
+
+    def assertCountsMatch(self):
+        for feed, queryset in self.feeds.items():
+            with self.subTest(feed=feed):
+                self.assertEqual(feed_count(queryset, feed), queryset.count())
+
+    def warm_up(self):
+        for feed, queryset in self.feeds.items():
+            feed_count(queryset, feed)
+
+    def test_count_is_served_from_cache(self):
+        """Повторный запрос общего количества не ходит в базу."""
+        self.warm_up()
+        with self.assertNumQueries(0):
+            self.assertEqual(feed_count(Post.objects.all(), FEED_ALL), 1)
+
+    def test_author_and_group_counts_come_from_counters(self):
+        """Количество постов автора и группы читается из счётчиков."""
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                feed_count(
+                    self.group.posts.all(), feed_key('group', self.group.pk)
+                ),
+                1
+            )
+
+    def test_counts_follow_creation_and_deletion(self):
+        """Создание и удаление поста меняют счётчики без пересчёта."""
+        self.warm_up()
+        Post.objects.create(author=self.user, text='Ещё', group=self.group)
+        self.assertCountsMatch()
+        self.post.delete()
+        self.assertCountsMatch()
+
+    def test_group_change_moves_count(self):
+        """Смена группы переносит пост между счётчиками групп."""
+        self.warm_up()
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertCountsMatch()
+
+    @override_settings(FEED_COUNT_EXACT_LIMIT=5)
+    def test_estimate_past_threshold(self):
+        """Выше порога количество оценивается по диапазону id."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}') for i in range(39)
+        )
+        Post.objects.filter(pk__in=Post.objects.order_by('id').values_list(
+            'id', flat=True
+        )[1:21:2]).delete()
+        estimate = count_or_estimate(Post.objects.all())
+        self.assertGreater(estimate, 5)
+        self.assertAlmostEqual(estimate, Post.objects.count(), delta=10)
+        self.assertEqual(count_or_estimate(self.group.posts.all()), 1)
+
+    @override_settings(FEED_COUNT_EXACT_LIMIT=5)
+    def test_overestimated_last_page_is_not_empty(self):
+        """Завышенная оценка не приводит к пустой последней странице."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}') for i in range(39)
+        )
+        Post.objects.filter(pk__in=Post.objects.order_by('id').values_list(
+            'id', flat=True
+        )[1:29]).delete()
+        self.assertGreater(
+            count_or_estimate(Post.objects.all()), Post.objects.count()
+        )
+        response = self.client.get(reverse('posts:main_page') + '?page=4')
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.num_pages, 2)
+        self.assertEqual(page_obj.number, 2)
+        self.assertEqual(len(page_obj), 2)
+        self.assertEqual(feed_count(Post.objects.all(), FEED_ALL), 12)
@@ -0,0 +1,83 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+
+from ..models import (Comment, Follow, Post, PostTag, PulledAuthor, Tag,
+                      TimelineEntry, User, UserCounters)
+
+OPTIONS = {
+    'users': 40, 'groups': 3, 'posts': 300, 'tags': 20,
+    'comments_per_post': 2, 'followings': 5, 'seed': 7,
+}
+
+
+def generate(**options):
+    out = StringIO()
+    call_command('generate_dataset', stdout=out, **{**OPTIONS, **options})
+    return out.getvalue()
+
+
+class GenerateDatasetTests(TestCase):
+    def test_generates_rows(self):
+        """Команда создаёт все сущности и печатает этапы."""
+        out = generate()
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertTrue(Comment.objects.exists())
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(PostTag.objects.exists())
+        self.assertIn('посты: 300', out)
+        self.assertFalse(Follow.objects.filter(
+            user_id=F('author_id')
+        ).exists())
+
+    def test_counters_are_reconciled(self):
+        """После bulk_create счётчики совпадают с фактом."""
+        generate()
+        for counters in UserCounters.objects.all():
+            self.assertEqual(
+                counters.posts_count,
+                Post.objects.filter(author_id=counters.user_id).count()
+            )
+            self.assertEqual(
+                counters.followers_count,
+                Follow.objects.filter(author_id=counters.user_id).count()
+            )
+        for tag in Tag.objects.annotate(actual=Count('post_tags')):
+            self.assertEqual(tag.posts_count, tag.actual)
+        post = Post.objects.annotate(actual=Count('comments')).first()
+        self.assertEqual(post.comments_count, post.actual)
+
+    @override_settings(FEED_PULL_FOLLOWER_THRESHOLD=10)
+    def test_timelines_skip_pulled_authors(self):
+        """Ленты заполнены для обычных авторов, популярные вытягиваются."""
+        generate()
+        pulled = set(PulledAuthor.objects.values_list('author_id', flat=True))
+        self.assertTrue(pulled)
+        self.assertFalse(
+            TimelineEntry.objects.filter(author_id__in=pulled).exists()
+        )
+        follow = Follow.objects.exclude(author_id__in=pulled).filter(
+            author__posts__isnull=False
+        ).first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user_id=follow.user_id, author_id=follow.author_id
+            ).count(),
+            Post.objects.filter(author_id=follow.author_id).count()
+        )
+
+    def test_seed_is_reproducible(self):
+        """Одинаковый seed даёт одинаковые данные."""
+        generate()
+        first = list(Post.objects.order_by('pk').values_list(
+            'text', 'author__username'
+        ))
+        User.objects.all().delete()
+        generate()
+        second = list(Post.objects.order_by('pk').values_list(
+            'text', 'author__username'
+        ))
+        self.assertEqual(first, second)
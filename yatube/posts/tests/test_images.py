@@ -0,0 +1,372 @@
+import base64
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import zlib
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+
+from ..forms import PostForm
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_file(name='image.jpg', size=(64, 32), orientation=None):
+    buffer = BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_ROOT)
+class ImageMetadataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_ROOT, ignore_errors=True)
+
+    def create_post(self, **kwargs):
+        return Post.objects.create(author=self.user, text='Пост', **kwargs)
+
+    def test_upload_stores_dimensions_and_placeholder(self):
+        """При загрузке сохраняются размеры и заглушка картинки."""
+        post = self.create_post(image=image_file())
+        self.assertEqual((post.image_width, post.image_height), (64, 32))
+        prefix = 'data:image/jpeg;base64,'
+        self.assertTrue(post.image_placeholder.startswith(prefix))
+        data = base64.b64decode(post.image_placeholder[len(prefix):])
+        with Image.open(BytesIO(data)) as placeholder:
+            self.assertLessEqual(
+                max(placeholder.size), settings.IMAGE_PLACEHOLDER_SIZE
+            )
+
+    def test_rotated_photo_dimensions(self):
+        """Размеры учитывают поворот из EXIF."""
+        post = self.create_post(image=image_file(orientation=6))
+        self.assertEqual((post.image_width, post.image_height), (32, 64))
+
+    def test_unreadable_image_leaves_metadata_empty(self):
+        """Битый файл сохраняется без размеров, а не роняет сохранение."""
+        content = image_file(size=(400, 300)).read()
+        post = self.create_post(image=SimpleUploadedFile(
+            'truncated.jpg', content[:len(content) // 2], 'image/jpeg'
+        ))
+        self.assertTrue(post.image)
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_removed_image_clears_metadata(self):
+        """Удаление картинки сбрасывает размеры и заглушку."""
+        post = self.create_post(image=image_file())
+        post.image = None
+        post.save()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_card_renders_fixed_size_lazy_image(self):
+        """Карточка выводит картинку с размерами и ленивой загрузкой."""
+        post = self.create_post(image=image_file())
+        post.thumbnail = None
+        html = render_to_string('includes/post_card.html', {'post': post})
+        self.assertIn('width="64" height="32"', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn(post.image_placeholder, html)
+
+    def test_backfill_command(self):
+        """Команда заполняет размеры у старых постов."""
+        post = self.create_post(image=image_file())
+        missing = self.create_post(image='posts/missing.jpg')
+        Post.objects.update(
+            image_width=None, image_height=None, image_placeholder=''
+        )
+        out = StringIO()
+        call_command('backfill_image_metadata', stdout=out)
+        post.refresh_from_db()
+        missing.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (64, 32))
+        self.assertTrue(post.image_placeholder)
+        self.assertIsNone(missing.image_width)
+        self.assertIn('обработано 1, не удалось прочитать 1', out.getvalue())
+
+
+def encoded_image(size, format_='JPEG', mode='RGB', exif=None):
+    buffer = BytesIO()
+    options = {'exif': exif} if exif is not None else {}
+    Image.new(mode, size, 'white').save(buffer, format_, **options)
+    return buffer.getvalue()
+
+
+def png_header(width, height):
+    data = bytearray(encoded_image((1, 1), 'PNG'))
+    data[16:24] = width.to_bytes(4, 'big') + height.to_bytes(4, 'big')
+    data[29:33] = zlib.crc32(bytes(data[12:29])).to_bytes(4, 'big')
+    return bytes(data)
+
+
+PEAK_MEMORY_SCRIPT = '''
+import sys
+
+import django
+
+django.setup()
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from posts.images import ingest_image
+
+
+def peak_rss():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+
+
+data = sys.stdin.buffer.read()
+before = peak_rss()
+ingest_image(SimpleUploadedFile('upload.jpg', data))
+print(peak_rss() - before)
+'''
+
+
+def peak_ingest_bytes(content):
+    """Прирост пиковой памяти при загрузке в отдельном процессе.
+
+    Буферы Pillow выделяются в C и tracemalloc их не видит, поэтому
+    пик берётся из VmHWM свежего процесса.
+    """
+    result = subprocess.run(
+        [sys.executable, '-c', PEAK_MEMORY_SCRIPT],
+        input=content,
+        stdout=subprocess.PIPE,
+        check=True,
+        cwd=settings.BASE_DIR,
+        env=dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='yatube.settings',
+            PYTHONPATH=settings.BASE_DIR,
+        ),
+    )
+    return int(result.stdout)
+
+
+@override_settings(MEDIA_ROOT=TEMP_ROOT)
+class ImageIngestionTests(TestCase):
+    def form(self, content, name='upload.jpg'):
+        return PostForm(
+            data={'text': 'Пост с картинкой'},
+            files={'image': SimpleUploadedFile(name, content)}
+        )
+
+    def test_large_jpeg_is_resized(self):
+        """Большой JPEG ужимается до допустимой стороны."""
+        form = self.form(encoded_image((6000, 4000)))
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as stored:
+            self.assertEqual(stored.size, (2560, 1707))
+
+    @unittest.skipUnless(
+        os.path.exists('/proc/self/status'), 'нужен /proc'
+    )
+    def test_large_jpeg_peak_memory(self):
+        """Пик памяти меньше одного полного декодирования JPEG."""
+        content = encoded_image((6000, 4000))
+        full_decode = 6000 * 4000 * 4
+        self.assertLess(peak_ingest_bytes(content), full_decode)
+
+    def test_pixel_limit(self):
+        """Слишком большие картинки отклоняются до декодирования."""
+        with override_settings(IMAGE_MAX_DECODED_PIXELS=10_000):
+            form = self.form(encoded_image((200, 200), 'PNG'), 'big.png')
+            self.assertFalse(form.is_valid())
+        with override_settings(IMAGE_MAX_PIXELS=10_000):
+            form = self.form(encoded_image((200, 200)), 'big.jpg')
+            self.assertFalse(form.is_valid())
+        form = self.form(png_header(30_000, 30_000), 'bomb.png')
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def test_undraftable_formats_have_lower_limit(self):
+        """PNG декодируется целиком, поэтому его предел ниже."""
+        form = self.form(png_header(5000, 4000), 'wide.png')
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'too_many_pixels'
+        )
+
+    def test_truncated_upload_is_rejected(self):
+        """Обрезанный файл отклоняется формой, а не роняет запрос."""
+        content = encoded_image((400, 300))
+        form = self.form(content[:len(content) // 2], 'truncated.jpg')
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'invalid_image'
+        )
+
+    def test_unsupported_format(self):
+        """Форматы вне списка разрешённых отклоняются."""
+        form = self.form(encoded_image((20, 20), 'BMP'), 'image.bmp')
+        self.assertFalse(form.is_valid())
+
+    def test_metadata_is_stripped(self):
+        """EXIF удаляется, а поворот применяется к пикселям."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Камера'
+        form = self.form(encoded_image((40, 20), exif=exif))
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as stored:
+            self.assertEqual(stored.size, (20, 40))
+            self.assertEqual(dict(stored.getexif()), {})
+
+    def test_animation_metadata_is_stripped(self):
+        """У анимации остаются кадры, но пропадают EXIF, XMP и комментарий."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        frames = [
+            Image.new('RGB', (20, 10), color) for color in ('red', 'blue')
+        ]
+        for format_, options in (
+            ('GIF', {'comment': b'secret'}),
+            ('WEBP', {'exif': exif, 'xmp': b'<x:xmpmeta>secret</x>'}),
+        ):
+            with self.subTest(format_=format_):
+                buffer = BytesIO()
+                frames[0].save(
+                    buffer, format_, save_all=True,
+                    append_images=frames[1:], duration=100, **options
+                )
+                form = self.form(buffer.getvalue(), f'anim.{format_}')
+                self.assertTrue(form.is_valid(), form.errors)
+                content = form.cleaned_data['image'].read()
+                self.assertNotIn(b'secret', content)
+                self.assertNotIn(b'Camera', content)
+                with Image.open(BytesIO(content)) as stored:
+                    self.assertEqual(stored.format, format_)
+                    self.assertEqual(stored.n_frames, 2)
+
+    def test_ingested_image_is_saved_with_metadata(self):
+        """Нормализованная картинка сохраняется вместе с размерами."""
+        user = User.objects.create_user(username='test-user')
+        form = self.form(encoded_image((3000, 1000)), 'wide.jpeg')
+        self.assertTrue(form.is_valid(), form.errors)
+        post = form.save(commit=False)
+        post.author = user
+        post.save()
+        self.assertRegex(post.image.name, r'^posts/[0-9a-f]{64}\.jpg$')
+        self.assertEqual((post.image_width, post.image_height), (2560, 853))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (2560, 853))
+
+
+@override_settings(MEDIA_ROOT=TEMP_ROOT, THUMBNAIL_QUEUE=False)
+class ImageStorageTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='test-user')
+        self.storage = Post._meta.get_field('image').storage
+
+    def tearDown(self):
+        shutil.rmtree(os.path.join(TEMP_ROOT, 'posts'), ignore_errors=True)
+        shutil.rmtree(os.path.join(TEMP_ROOT, 'cache'), ignore_errors=True)
+
+    def create_post(self, **kwargs):
+        return Post.objects.create(author=self.user, text='Пост', **kwargs)
+
+    def test_same_content_is_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом."""
+        first = self.create_post(image=image_file('first.JPG'))
+        second = self.create_post(image=image_file('second.jpg'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.endswith('.jpg'))
+        self.assertEqual(os.listdir(os.path.join(TEMP_ROOT, 'posts')), [
+            os.path.basename(first.image.name)
+        ])
+
+    def collect(self, grace):
+        out = StringIO()
+        call_command('dedupe_media', f'--grace={grace}', stdout=out)
+        return out.getvalue()
+
+    def age(self, path, seconds):
+        moment = time.time() - seconds
+        os.utime(path, (moment, moment))
+
+    def test_deleted_post_keeps_file_until_collected(self):
+        """Файл удаляется не сразу, а сборкой после последнего поста."""
+        first = self.create_post(image=image_file())
+        second = self.create_post(image=image_file())
+        path = first.image.path
+        first.delete()
+        second.delete()
+        self.assertTrue(os.path.exists(path))
+        self.assertIn('удалено 0', self.collect(grace=60))
+        self.age(path, 120)
+        self.assertIn('удалено 1', self.collect(grace=60))
+        self.assertFalse(os.path.exists(path))
+
+    def test_replaced_image_is_collected(self):
+        """Заменённая картинка собирается, если больше не используется."""
+        post = self.create_post(image=image_file())
+        path = post.image.path
+        post.image = image_file(size=(32, 32))
+        post.save()
+        self.assertTrue(os.path.exists(path))
+        self.collect(grace=0)
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_reused_file_is_not_collected(self):
+        """Повторная загрузка того же файла продлевает ему жизнь."""
+        first = self.create_post(image=image_file())
+        path = first.image.path
+        first.delete()
+        self.age(path, 120)
+        self.create_post(image=image_file()).delete()
+        self.collect(grace=60)
+        self.assertTrue(os.path.exists(path))
+
+    def test_foreign_paths_are_not_released(self):
+        """Пути вне хранилища не удаляются."""
+        post = self.create_post(image='/nonexistent/image.jpg')
+        post.delete()
+
+    def test_dedupe_command(self):
+        """Команда переносит старые файлы на имена по содержимому."""
+        content = image_file().read()
+        names = ['posts/old.jpg', 'posts/copy.jpg']
+        for name in names:
+            path = os.path.join(TEMP_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file_:
+                file_.write(content)
+        Post.objects.bulk_create(
+            Post(author=self.user, text='Пост', image=name) for name in names
+        )
+        out = StringIO()
+        call_command('dedupe_media', stdout=out)
+        images = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(images), 1)
+        self.assertRegex(images.pop(), r'^posts/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(len(os.listdir(os.path.join(TEMP_ROOT, 'posts'))), 1)
+        self.assertIn('проверено 2, переименовано 2', out.getvalue())
@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..search import search_posts
+
+User = get_user_model()
+
+
+class PostSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Классика', slug='classics', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Все счастливые семьи похожи друг на друга',
+        )
+
+    def found(self, query):
+        return list(search_posts(query).values_list('pk', flat=True))
+
+    def test_index_follows_posts(self):
+        """Индекс обновляется при создании, правке и удалении поста."""
+        post = Post.objects.create(author=self.user, text='Метель и бесы')
+        self.assertEqual(self.found('метель'), [post.pk])
+        self.assertEqual(self.found('БЕС'), [post.pk])
+        post.text = 'Снежная буря'
+        post.save()
+        self.assertEqual(self.found('метель'), [])
+        self.assertEqual(self.found('буря'), [post.pk])
+        post.delete()
+        self.assertEqual(self.found('буря'), [])
+
+    def test_author_and_group_are_indexed(self):
+        """Поиск учитывает имя автора и название группы."""
+        self.assertEqual(self.found('толстой'), [self.post.pk])
+        self.assertEqual(self.found('классика'), [self.post.pk])
+        Group.objects.filter(pk=self.group.pk).update(title='Романы')
+        User.objects.filter(pk=self.user.pk).update(last_name='Николаевич')
+        self.assertEqual(self.found('классика'), [])
+        self.assertEqual(self.found('толстой'), [])
+        self.assertEqual(self.found('романы николаевич'), [self.post.pk])
+
+    def total_changes(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT total_changes()')
+            return cursor.fetchone()[0]
+
+    def test_unchanged_rows_are_not_reindexed(self):
+        """Сохранение без изменений индексируемых полей не трогает индекс."""
+        for instance in (
+            User.objects.get(pk=self.user.pk),
+            Group.objects.get(pk=self.group.pk),
+        ):
+            with self.subTest(model=type(instance).__name__):
+                before = self.total_changes()
+                instance.save()
+                self.assertEqual(self.total_changes() - before, 1)
+
+    def test_snippet_comes_from_text(self):
+        """Фрагмент берётся из текста, даже если совпало имя автора."""
+        post = search_posts('толстой').get()
+        self.assertTrue(post.snippet.startswith('Все счастливые'))
+
+    def test_text_matches_rank_higher(self):
+        """Совпадение в тексте важнее совпадения в имени автора."""
+        other = User.objects.create_user(username='семьи')
+        by_name = Post.objects.create(author=other, text='Другой пост')
+        self.assertEqual(self.found('семьи'), [self.post.pk, by_name.pk])
+
+    def test_query_syntax_is_escaped(self):
+        """Служебные символы запроса не ломают поиск."""
+        for query in ('"', 'семьи OR', 'NEAR(', '*', ''):
+            with self.subTest(query=query):
+                list(search_posts(query))
+
+    def test_search_page(self):
+        """Страница поиска подсвечивает совпадения и экранирует текст."""
+        Post.objects.create(author=self.user, text='<b>семьи</b> и дети')
+        response = Client().get(reverse('posts:search'), {'q': 'семьи'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+        self.assertContains(response, '<mark>семьи</mark>')
+        self.assertContains(response, '&lt;b&gt;<mark>семьи</mark>')
+
+    def test_pagination_keeps_query(self):
+        """Ссылки пагинации сохраняют поисковый запрос."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'семьи {i}') for i in range(15)
+        )
+        response = Client().get(reverse('posts:search'), {'q': 'семьи'})
+        self.assertContains(response, 'href="?q=%D1%81%D0%B5%D0%BC')
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по полнотекстовому индексу."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'толстой'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].queryset), [self.post]
+        )
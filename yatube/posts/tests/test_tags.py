@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..counters import reconcile
+from ..models import Post, PostTag, Tag
+from ..tags import extract_tags, link_tags
+
+User = get_user_model()
+
+
+class TagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='test-user')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self, text):
+        return Post.objects.create(author=self.user, text=text)
+
+    def tag_count(self, name):
+        return Tag.objects.get(name=name).posts_count
+
+    def test_extract_tags(self):
+        """Теги нормализуются, а якоря и сущности игнорируются."""
+        self.assertEqual(
+            extract_tags('#Python и #ПИТОН, #python a#b &#39; ##x #д_3'),
+            {'python', 'питон', 'д_3'}
+        )
+
+    def test_tags_are_indexed_on_create(self):
+        """Теги из текста сохраняются вместе с датой поста."""
+        post = self.create_post('Пишу на #Django и #python')
+        self.assertEqual(
+            set(post.post_tags.values_list('tag__name', flat=True)),
+            {'django', 'python'}
+        )
+        self.assertEqual(post.post_tags.first().pub_date, post.pub_date)
+        self.assertEqual(self.tag_count('python'), 1)
+
+    def test_edit_updates_only_diff(self):
+        """Правка поста меняет только изменившиеся теги."""
+        post = self.create_post('#one #two')
+        kept = PostTag.objects.get(post=post, tag__name='one').pk
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': '#one #three'}
+        )
+        self.assertEqual(PostTag.objects.get(tag__name='one').pk, kept)
+        self.assertFalse(PostTag.objects.filter(tag__name='two').exists())
+        self.assertEqual(self.tag_count('two'), 0)
+        self.assertEqual(self.tag_count('three'), 1)
+
+    def test_unchanged_text_skips_tags(self):
+        """Сохранение без правки текста не трогает теги."""
+        post = self.create_post('#one')
+        with self.assertNumQueries(3):
+            post.save()
+
+    def test_delete_decrements_counters(self):
+        """Удаление поста уменьшает счётчики его тегов."""
+        first = self.create_post('#shared')
+        self.create_post('#shared')
+        first.delete()
+        self.assertEqual(self.tag_count('shared'), 1)
+        tag = Tag.objects.get(name='shared')
+        self.assertEqual(reconcile(Tag, [tag.pk]), 0)
+
+    def test_tag_page(self):
+        """Страница тега показывает его посты, новые сверху."""
+        older = self.create_post('#новости старые')
+        newer = self.create_post('#Новости свежие')
+        self.create_post('без тегов')
+        response = self.authorized_client.get(
+            reverse('posts:tag', kwargs={'name': 'НОВОСТИ'})
+        )
+        self.assertEqual(response.context['tag'].name, 'новости')
+        self.assertEqual(
+            list(response.context['page_obj']), [newer, older]
+        )
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+
+    @override_settings(CURSOR_PAGINATION=True)
+    def test_tag_page_total_comes_from_counter(self):
+        """Число записей тега берётся из счётчика, без COUNT по постам."""
+        self.create_post('#новости первая')
+        self.create_post('#новости вторая')
+        url = reverse('posts:tag', kwargs={'name': 'новости'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        self.assertContains(response, 'Всего записей: 2')
+        self.assertFalse(
+            [query for query in queries if 'COUNT(' in query['sql']]
+        )
+
+    def test_unknown_tag_is_not_found(self):
+        """Несуществующий тег отдаёт 404."""
+        response = self.authorized_client.get(
+            reverse('posts:tag', kwargs={'name': 'нет'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_tags_are_linked_in_text(self):
+        """Теги в тексте превращаются в ссылки, остальное экранируется."""
+        url = reverse('posts:tag', kwargs={'name': 'тег'})
+        self.assertEqual(
+            link_tags('<b> #Тег'), f'&lt;b&gt; <a href="{url}">#Тег</a>'
+        )
@@ -0,0 +1,228 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from ..caching import card_cache_key
+from ..models import Post, ThumbnailJob
+from ..thumbnails import (generate_thumbnails, prefetch_thumbnails,
+                          ready_thumbnail, thumbnail_variants,
+                          thumbnails_ready)
+
+User = get_user_model()
+
+TEMP_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_ROOT, THUMBNAIL_QUEUE=False)
+class ThumbnailPipelineTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test-user')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self, name='small.gif', content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(name, content, 'image/gif')
+        )
+
+    def test_all_geometries_are_generated(self):
+        """Для картинки создаются миниатюры всех настроенных размеров."""
+        post = self.create_post()
+        generate_thumbnails(post.image.name)
+        for geometry_string, options in thumbnail_variants():
+            with self.subTest(geometry=geometry_string, **options):
+                thumbnail = ready_thumbnail(
+                    post.image, geometry_string, **options
+                )
+                self.assertIsNotNone(thumbnail)
+                self.assertTrue(os.path.exists(
+                    os.path.join(TEMP_ROOT, thumbnail.name)
+                ))
+
+    def test_card_falls_back_to_original(self):
+        """Пока миниатюры нет, карточка показывает исходную картинку."""
+        post = self.create_post()
+        prefetch_thumbnails([post], 'card')
+        html = render_to_string('includes/post_card.html', {'post': post})
+        self.assertIn(post.image.url, html)
+        thumbnails_ready(generate_thumbnails(post.image.name))
+        prefetch_thumbnails([post], 'card')
+        html = render_to_string('includes/post_card.html', {'post': post})
+        self.assertIn(post.thumbnail.url, html)
+
+    def test_create_queues_thumbnails(self):
+        """Создание поста с картинкой ставит миниатюры в очередь."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(
+                    'created.gif', SMALL_GIF, 'image/gif'
+                ),
+            }
+        )
+        post = Post.objects.get(author=self.user)
+        self.assertTrue(post.image)
+        self.assertIsNotNone(ready_thumbnail(post.image, '960x400'))
+
+    @override_settings(THUMBNAIL_QUEUE=True)
+    def test_queue_is_processed_by_command(self):
+        """Веб-запрос только ставит задание, миниатюры создаёт команда."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(
+                    'queued.gif', SMALL_GIF, 'image/gif'
+                ),
+            }
+        )
+        post = Post.objects.get(author=self.user)
+        self.assertTrue(
+            ThumbnailJob.objects.filter(name=post.image.name).exists()
+        )
+        self.assertIsNone(ready_thumbnail(post.image, '960x400'))
+        out = StringIO()
+        call_command(
+            'process_thumbnails', '--once', '--workers=0', stdout=out
+        )
+        self.assertIn(post.image.name, out.getvalue())
+        self.assertFalse(ThumbnailJob.objects.exists())
+        self.assertIsNotNone(ready_thumbnail(post.image, '960x400'))
+        self.assertEqual(Post.objects.get(pk=post.pk).modified, post.modified)
+
+    def test_card_key_follows_thumbnails(self):
+        """Готовые миниатюры меняют ключ карточки, а не дату поста."""
+        post = self.create_post()
+        prefetch_thumbnails([post], 'card')
+        pending = card_cache_key(post)
+        thumbnails_ready(generate_thumbnails(post.image.name))
+        post = Post.objects.get(pk=post.pk)
+        prefetch_thumbnails([post], 'card')
+        self.assertNotEqual(card_cache_key(post), pending)
+
+    def test_pregenerate_command(self):
+        """Команда создаёт миниатюры для уже загруженных картинок."""
+        post = self.create_post()
+        out = StringIO()
+        call_command('pregenerate_thumbnails', '--workers=0', stdout=out)
+        self.assertIn(f'1/1: {post.image.name}', out.getvalue())
+        self.assertIsNotNone(ready_thumbnail(post.image, '960x339'))
+
+    def test_pregenerate_command_skips_unreadable_files(self):
+        """Битый файл не прерывает создание остальных миниатюр."""
+        buffer = BytesIO()
+        Image.new('RGB', (400, 300), 'white').save(buffer, 'JPEG')
+        content = buffer.getvalue()
+        broken = self.create_post('broken.jpg', content[:len(content) // 2])
+        post = self.create_post()
+        out = StringIO()
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            call_command('pregenerate_thumbnails', '--workers=0', stdout=out)
+        self.assertIn(f'{broken.image.name} не удалось', out.getvalue())
+        self.assertIsNotNone(ready_thumbnail(post.image, '960x339'))
+
+    def test_page_thumbnails_are_prefetched_at_once(self):
+        """Миниатюры страницы ленты читаются одним запросом."""
+        posts = [
+            self.create_post(
+                f'small-{i}.gif',
+                SMALL_GIF.replace(b'\xFF\xFF\xFF', bytes([i] * 3))
+            )
+            for i in range(5)
+        ]
+        posts.append(
+            Post.objects.create(author=self.user, text='Без картинки')
+        )
+        for post in posts[:3]:
+            generate_thumbnails(post.image.name)
+        cache.clear()
+        with self.assertNumQueries(1):
+            prefetch_thumbnails(posts, 'card')
+        self.assertEqual(
+            [post.thumbnail is not None for post in posts],
+            [True, True, True, False, False, False]
+        )
+        with self.assertNumQueries(0):
+            prefetch_thumbnails(posts, 'card')
+        self.assertEqual(
+            posts[0].thumbnail.url,
+            ready_thumbnail(posts[0].image, '960x339').url
+        )
+
+    def test_missing_thumbnails_are_cached_briefly(self):
+        """Отсутствие миниатюры кэшируется ненадолго."""
+        post = self.create_post()
+        kvstore_cache = default.kvstore.cache
+        with mock.patch.object(
+            kvstore_cache, 'set_many', wraps=kvstore_cache.set_many
+        ) as set_many:
+            prefetch_thumbnails([post], 'card')
+        timeouts = {
+            timeout
+            for (values, timeout), _ in set_many.call_args_list
+            if values
+        }
+        self.assertEqual(timeouts, {settings.THUMBNAIL_MISS_TIMEOUT})
+
+    def test_feed_page_uses_prefetched_thumbnails(self):
+        """Карточки ленты показывают заранее найденные миниатюры."""
+        post = self.create_post()
+        thumbnails_ready(generate_thumbnails(post.image.name))
+        response = self.authorized_client.get(reverse('posts:main_page'))
+        thumbnail = response.context['page_obj'][0].thumbnail
+        self.assertContains(response, thumbnail.url)
+
+    def test_variants_are_emitted_as_srcset(self):
+        """Карточка получает srcset всех ширин и WebP-источник."""
+        post = self.create_post()
+        thumbnails_ready(generate_thumbnails(post.image.name))
+        prefetch_thumbnails([post], 'card')
+        self.assertEqual(set(post.srcsets), {'jpeg', 'webp'})
+        for srcset in post.srcsets.values():
+            for width in settings.POST_IMAGE_WIDTHS:
+                self.assertIn(f' {width}w', srcset)
+        html = render_to_string('includes/post_card.html', {'post': post})
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(post.srcsets['jpeg'], html)
+
+    def test_storage_report(self):
+        """Отчёт показывает место, занятое каждым вариантом."""
+        post = self.create_post()
+        generate_thumbnails(post.image.name)
+        out = StringIO()
+        call_command('thumbnail_storage_report', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2 + len(thumbnail_variants()))
+        self.assertIn('320x113 webp', out.getvalue())
+        self.assertIn('оригиналы', lines[1])
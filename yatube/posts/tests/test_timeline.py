@@ -0,0 +1,182 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Follow, Post, PulledAuthor, TimelineEntry
+from ..timeline import MergedFeed, followings_feed
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.stranger = User.objects.create_user(username='stranger')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def timeline_ids(self, user):
+        return list(
+            TimelineEntry.objects.filter(user=user).order_by(
+                '-pub_date', '-post'
+            ).values_list('post_id', flat=True)
+        )
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков, и только их."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.timeline_ids(self.reader), [post.id])
+        self.assertEqual(self.timeline_ids(self.stranger), [])
+
+    @override_settings(TIMELINE_BACKFILL_LIMIT=2)
+    def test_follow_backfills_latest_posts(self):
+        """Подписка добавляет в ленту последние посты автора."""
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        self.client.get(
+            reverse('posts:follow', kwargs={'username': 'author'})
+        )
+        self.assertEqual(
+            sorted(self.timeline_ids(self.reader)),
+            sorted(post.id for post in posts[1:])
+        )
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.stranger)
+        Post.objects.create(author=self.author, text='Пост автора')
+        stranger_post = Post.objects.create(
+            author=self.stranger, text='Пост другого'
+        )
+        self.client.get(
+            reverse('posts:unfollow', kwargs={'username': 'author'})
+        )
+        self.assertEqual(self.timeline_ids(self.reader), [stranger_post.id])
+
+    def test_post_deletion_prunes_timeline(self):
+        """Удалённый пост пропадает из лент."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        post.delete()
+        self.assertEqual(self.timeline_ids(self.reader), [])
+
+    def test_followings_page_reads_timeline(self):
+        """Лента подписок строится по материализованной таблице."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        Post.objects.create(author=self.stranger, text='Чужой пост')
+        TimelineEntry.objects.filter(post=posts[0]).delete()
+        response = self.client.get(reverse('posts:followings'))
+        self.assertEqual(
+            list(response.context['page_obj']), [posts[2], posts[1]]
+        )
+
+
+@override_settings(FEED_PULL_FOLLOWER_THRESHOLD=2)
+class HybridFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.star)
+
+    def test_popular_author_is_pulled(self):
+        """Посты популярного автора не раскладываются по лентам."""
+        early = Post.objects.create(author=self.star, text='Ещё не звезда')
+        Follow.objects.create(user=self.fan, author=self.star)
+        late = Post.objects.create(author=self.star, text='Уже звезда')
+        self.assertTrue(
+            PulledAuthor.objects.filter(author=self.star).exists()
+        )
+        self.assertTrue(TimelineEntry.objects.filter(post=early).exists())
+        self.assertFalse(TimelineEntry.objects.filter(post=late).exists())
+        self.assertEqual(
+            list(followings_feed(self.reader)[:10]), [late, early]
+        )
+
+    def test_pushed_and_pulled_posts_are_merged_in_order(self):
+        """Лента сливает разложенные и подтянутые посты по дате."""
+        Follow.objects.create(user=self.fan, author=self.star)
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {i}')
+            for i, author in enumerate(
+                [self.star, self.author, self.star, self.author, self.star]
+            )
+        ]
+        feed = followings_feed(self.reader)
+        self.assertIsInstance(feed, MergedFeed)
+        self.assertEqual(feed.count(), 5)
+        self.assertEqual(feed[1:4], posts[::-1][1:4])
+        response = self.client_for(self.reader).get(
+            reverse('posts:followings')
+        )
+        self.assertEqual(list(response.context['page_obj']), posts[::-1])
+
+    def test_cursor_pages_over_merged_feed(self):
+        """Курсорная пагинация работает поверх слияния."""
+        Follow.objects.create(user=self.fan, author=self.star)
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {i}')
+            for i, author in enumerate([self.star, self.author] * 7)
+        ]
+        client = self.client_for(self.reader)
+        with self.settings(CURSOR_PAGINATION=True):
+            first = client.get(reverse('posts:followings')).context[
+                'page_obj'
+            ]
+            second = client.get(
+                reverse('posts:followings'), {'after': first.next_cursor}
+            ).context['page_obj']
+        self.assertEqual(list(first) + list(second), posts[::-1])
+
+    def test_merged_feed_reads_one_page_per_source(self):
+        """Каждая лента слияния читает не больше страницы строк."""
+        Follow.objects.create(user=self.fan, author=self.star)
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {i}')
+            for i, author in enumerate([self.star, self.author] * 15)
+        ]
+        client = self.client_for(self.reader)
+        first = client.get(reverse('posts:followings')).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            second = client.get(
+                reverse('posts:followings'), {'after': first.next_cursor}
+            ).context['page_obj']
+        self.assertEqual(list(second), posts[::-1][10:20])
+        limits = [
+            int(limit) for query in queries
+            for limit in re.findall(r'LIMIT (\d+)', query['sql'])
+        ]
+        self.assertTrue(limits)
+        self.assertLessEqual(max(limits), settings.ON_PAGE + 1)
+        self.assertFalse(
+            any('OFFSET' in query['sql'] for query in queries)
+        )
+
+    def client_for(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
@@ -1,12 +1,20 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase, override_settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from ..models import Group, Post
+from ..utils import (ELLIPSIS, CursorPaginator, decode_cursor,
+                     elided_page_range, encode_cursor, paginator)
 
 User = get_user_model()
 
@@ -35,13 +43,126 @@ class ProjectUtilsTests(TestCase):
         shutil.rmtree(TEMP_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
     def test_main_page_cache(self):
+        """Страница ленты берётся из кэша, пока посты не менялись."""
         response = self.authorized_client.get(reverse('posts:main_page'))
         response_content_first = response.content
-        self.post.delete()
+        Post.objects.filter(pk=self.post.pk).update(text='Изменённый пост')
         response = self.authorized_client.get(reverse('posts:main_page'))
         response_content_second = response.content
         self.assertEqual(response_content_first, response_content_second)
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test-user')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {i}')
+            for i in range(settings.ON_PAGE * 2 + 3)
+        )
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get_page(self, **params):
+        request = self.factory.get('/', params)
+        return paginator(request, Post.objects.order_by('-pub_date'))
+
+    def test_cursor_round_trip(self):
+        """Курсор кодируется и декодируется без потерь."""
+        post = Post.objects.first()
+        self.assertEqual(
+            decode_cursor(encode_cursor(post)), (post.pub_date, post.pk)
+        )
+        self.assertIsNone(decode_cursor('мусор'))
+        self.assertIsNone(decode_cursor('bm90LWEtY3Vyc29y'))
+
+    def test_forward_and_backward_walk(self):
+        """Переходы по after/before обходят ленту без пропусков и повторов."""
+        with self.settings(CURSOR_PAGINATION=True):
+            pages = [self.get_page()]
+            while pages[-1].has_next():
+                pages.append(self.get_page(after=pages[-1].next_cursor))
+            walked = [post.id for page in pages for post in page]
+            self.assertEqual(walked, self.expected)
+            self.assertFalse(pages[0].has_previous())
+            previous = self.get_page(before=pages[-1].previous_cursor)
+            self.assertEqual(
+                [post.id for post in previous],
+                [post.id for post in pages[-2]]
+            )
+
+    def test_cursor_page_does_not_count(self):
+        """Курсорная страница — один запрос без COUNT и OFFSET."""
+        first = Post.objects.get(pk=self.expected[0])
+        pager = CursorPaginator(Post.objects.all(), settings.ON_PAGE)
+        with CaptureQueriesContext(connection) as queries:
+            page = pager.get_cursor_page(after=encode_cursor(first))
+            self.assertTrue(page.has_other_pages())
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql'].upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Битый курсор отдаёт первую страницу."""
+        page = self.get_page(after='broken')
+        self.assertEqual(
+            [post.id for post in page],
+            self.expected[:settings.ON_PAGE]
+        )
+        self.assertFalse(page.has_previous())
+
+
+class ElidedPageRangeTests(TestCase):
+    def test_short_range_is_not_elided(self):
+        """Короткий список страниц выводится целиком."""
+        page_obj = Paginator(range(50), 10).page(3)
+        self.assertEqual(elided_page_range(page_obj), [1, 2, 3, 4, 5])
+
+    def test_long_range_is_windowed(self):
+        """Длинный список: края, окно вокруг текущей страницы и многоточия."""
+        pager = Paginator(range(10 ** 6), 10)
+        self.assertEqual(
+            elided_page_range(pager.page(5000)),
+            [1, 2, ELLIPSIS, 4997, 4998, 4999, 5000, 5001, 5002, 5003,
+             ELLIPSIS, 99999, 100000]
+        )
+        self.assertEqual(
+            elided_page_range(pager.page(1)),
+            [1, 2, 3, 4, ELLIPSIS, 99999, 100000]
+        )
+
+    def test_paginator_html_is_bounded(self):
+        """Размер разметки пагинатора не зависит от числа страниц."""
+        sizes = []
+        for num_pages in (100, 100000):
+            page_obj = Paginator(range(num_pages * 10), 10).page(50)
+            html = render_to_string(
+                'includes/paginator.html', {'page_obj': page_obj}
+            )
+            sizes.append(html.count('<li'))
+        self.assertEqual(sizes[0], sizes[1])
+        self.assertLess(sizes[1], 20)
+
+    @mock.patch('posts.templatetags.feed_tags.ELLIPSIS', '...')
+    @mock.patch('posts.utils.ELLIPSIS', '...')
+    def test_paginator_html_uses_ellipsis_constant(self):
+        """Многоточие в разметке берётся из ELLIPSIS, а не из шаблона."""
+        page_obj = Paginator(range(1000), 10).page(50)
+        html = render_to_string(
+            'includes/paginator.html', {'page_obj': page_obj}
+        )
+        self.assertIn('<li class="page-item disabled">', html)
+        self.assertNotIn('page=...', html)
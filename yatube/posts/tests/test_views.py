@@ -1,9 +1,13 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
+from ..comments import prefetch_latest_comments
 from ..models import Comment, Follow, Group, Post
 
 User = get_user_model()
@@ -35,6 +39,7 @@ class PostPagesTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -397,3 +402,162 @@ class PostPagesTests(TestCase):
         )
         follows = Follow.objects.count()
         self.assertEqual(follows, 1)
+
+
+@override_settings(COMMENTS_ON_PAGE=5)
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='test-user')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        commenters = User.objects.bulk_create(
+            User(username=f'commenter-{i}') for i in range(12)
+        )
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=author, text=f'Коммент {i}')
+            for i, author in enumerate(User.objects.filter(
+                username__in=[user.username for user in commenters]
+            ))
+        )
+        cls.newest = list(
+            cls.post.comments.order_by('-created', '-id')
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_first_chunk_is_inline(self):
+        """На странице поста выводится первая порция комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        comments = response.context['comments']
+        self.assertEqual(list(comments), self.newest[:5])
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'data-next="')
+
+    def test_authors_are_selected_together(self):
+        """Авторы комментариев читаются тем же запросом."""
+        response = self.client.get(
+            reverse('posts:comments', kwargs={'post_id': self.post.id})
+        )
+        first = response.json()
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse('posts:comments', kwargs={'post_id': self.post.id}),
+                {'after': first['next']}
+            )
+        self.assertContains(response, 'commenter-')
+
+    def test_load_more_walks_all_comments(self):
+        """Кнопка «Показать ещё» проходит по всем комментариям."""
+        url = reverse('posts:comments', kwargs={'post_id': self.post.id})
+        html, after, chunks = '', '', 0
+        while after is not None:
+            data = self.client.get(url, {'after': after}).json()
+            html += data['html']
+            after = data['next']
+            chunks += 1
+        self.assertEqual(chunks, 3)
+        for comment in self.newest:
+            self.assertIn(comment.text, html)
+
+    def test_missing_post(self):
+        """Для несуществующего поста комментарии не найдены."""
+        response = self.client.get(
+            reverse('posts:comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentPreviewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='test-user')
+        cls.commenter = User.objects.create_user(
+            username='commenter', first_name='Анна', last_name='Каренина'
+        )
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_posts(self, count, comments):
+        posts = [
+            Post.objects.create(
+                author=self.user, group=self.group, text=f'Пост {i}'
+            )
+            for i in range(count)
+        ]
+        for post in posts:
+            for i in range(comments):
+                Comment.objects.create(
+                    post=post, author=self.commenter, text=f'Коммент {i}'
+                )
+        return posts
+
+    def test_prefetch_is_one_query(self):
+        """Последние комментарии всех постов читаются одним запросом."""
+        posts = self.create_posts(3, 5)
+        posts.append(Post.objects.create(author=self.user, text='Пусто'))
+        posts = list(Post.objects.filter(pk__in=[p.pk for p in posts]))
+        with self.assertNumQueries(1):
+            prefetch_latest_comments(posts)
+            for post in posts:
+                for comment in post.latest_comments:
+                    comment.author.username
+        for post in posts:
+            expected = list(post.comments.order_by('-created', '-id')[:3])
+            self.assertEqual(post.latest_comments, expected)
+
+    def test_posts_without_comments_skip_query(self):
+        """Без комментариев запрос не выполняется."""
+        posts = [Post.objects.create(author=self.user, text='Пусто')]
+        with self.assertNumQueries(0):
+            prefetch_latest_comments(posts)
+        self.assertEqual(posts[0].latest_comments, [])
+
+    def page_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_preview_costs_one_query_per_page(self):
+        """Превью комментариев добавляет ленте ровно один запрос."""
+        posts = self.create_posts(10, 0)
+        Follow.objects.create(user=self.commenter, author=self.user)
+        urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:followings'),
+        )
+        self.client.force_login(self.commenter)
+        before = [self.page_queries(url) for url in urls]
+        for post in posts:
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.commenter, text=f'Коммент {i}')
+                for i in range(4)
+            )
+        Post.objects.update(comments_count=4)
+        self.assertEqual(
+            [self.page_queries(url) for url in urls],
+            [count + 1 for count in before]
+        )
+
+    def test_card_shows_latest_comments(self):
+        """Карточка показывает счётчик и три последних комментария."""
+        self.create_posts(1, 4)
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertContains(response, 'Комментарии: 4')
+        self.assertContains(response, 'Анна Каренина:', count=3)
+        self.assertNotContains(response, 'Коммент 0')
+        self.assertContains(response, 'Коммент 3')
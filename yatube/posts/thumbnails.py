@@ -0,0 +1,346 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections, transaction
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as thumbnail_defaults
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.engines.pil_engine import Engine as PILEngine
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDbKVStore)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core.metrics import count_lookup
+
+from . import caching, counts
+from .models import Post, ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_FORMAT = 'JPEG'
+
+_inherited_connections = []
+
+
+class Engine(PILEngine):
+    def _scale(self, image, width, height):
+        return image.resize((width, height), resample=Image.LANCZOS)
+
+
+def thumbnail_filename(source, geometry_string, options):
+    key = tokey(source.key, geometry_string, serialize(options))
+    return (
+        f'{thumbnail_settings.THUMBNAIL_PREFIX}{key[:2]}/{key[2:4]}/{key}.'
+        f'{EXTENSIONS[options["format"]]}'
+    )
+
+
+class Backend(ThumbnailBackend):
+    """Имя миниатюры считает thumbnail_filename, а не sorl.
+
+    Так страницы находят готовые миниатюры по ключу, не завися от
+    внутренностей конкретной версии sorl-thumbnail.
+    """
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        return thumbnail_filename(source, geometry_string, options)
+
+
+def thumbnail_name(source, geometry_string, options):
+    backend = default.backend
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(thumbnail_defaults, attr):
+            options.setdefault(key, value)
+    return thumbnail_filename(source, geometry_string, options)
+
+
+def image_formats():
+    Image.init()
+    return [
+        format_ for format_ in settings.POST_IMAGE_FORMATS
+        if format_ in Image.SAVE
+    ]
+
+
+def slot_variants(slot):
+    width, height = map(int, settings.POST_IMAGE_SLOTS[slot].split('x'))
+    for variant_width in settings.POST_IMAGE_WIDTHS:
+        if variant_width > width:
+            continue
+        variant_height = round(variant_width * height / width)
+        for format_ in image_formats():
+            options = dict(settings.POST_THUMBNAIL_OPTIONS, format=format_)
+            yield f'{variant_width}x{variant_height}', options
+
+
+def thumbnail_variants():
+    variants = []
+    for slot in settings.POST_IMAGE_SLOTS:
+        for variant in slot_variants(slot):
+            if variant not in variants:
+                variants.append(variant)
+    return variants
+
+
+def image_storage():
+    return Post._meta.get_field('image').storage
+
+
+def image_source(name):
+    return ImageFile(name, image_storage())
+
+
+def thumbnail_file(source, geometry_string, options):
+    name = thumbnail_name(source, geometry_string, dict(options))
+    return ImageFile(name, default.storage)
+
+
+def ready_thumbnail(file_, geometry_string, **options):
+    if not file_:
+        return None
+    options = dict(settings.POST_THUMBNAIL_OPTIONS, **options)
+    thumbnail = default.kvstore.get(
+        thumbnail_file(ImageFile(file_), geometry_string, options)
+    )
+    count_lookup('thumbnail', thumbnail is not None)
+    return thumbnail
+
+
+def get_many_raw(keys):
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDbKVStore):
+        return {key: kvstore._get_raw(key) for key in keys}
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        stored = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        kvstore.cache.set_many(
+            stored, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        kvstore.cache.set_many(
+            {key: EMPTY_VALUE for key in missing if key not in stored},
+            settings.THUMBNAIL_MISS_TIMEOUT
+        )
+        values.update(stored)
+    return {
+        key: value for key, value in values.items() if value != EMPTY_VALUE
+    }
+
+
+def prefetch_thumbnails(posts, slot):
+    variants = list(slot_variants(slot))
+    keys = []
+    for post in posts:
+        post.thumbnail = None
+        post.srcsets = {}
+        if not post.image:
+            continue
+        source = ImageFile(post.image)
+        for geometry_string, options in variants:
+            thumbnail = thumbnail_file(source, geometry_string, options)
+            keys.append((post, options['format'], add_prefix(thumbnail.key)))
+    values = get_many_raw(list({key for _, _, key in keys})) if keys else {}
+    found = sum(1 for _, _, key in keys if values.get(key))
+    count_lookup('thumbnail', True, found)
+    count_lookup('thumbnail', False, len(keys) - found)
+    for post, format_, key in keys:
+        if not values.get(key):
+            continue
+        thumbnail = deserialize_image_file(values[key])
+        post.srcsets.setdefault(format_.lower(), []).append(
+            f'{thumbnail.url} {thumbnail.width}w'
+        )
+        if format_ == FALLBACK_FORMAT:
+            post.thumbnail = thumbnail
+    for post in posts:
+        post.srcsets = {
+            format_: ', '.join(candidates)
+            for format_, candidates in post.srcsets.items()
+        }
+
+
+def forget_thumbnails(name):
+    kvstore = default.kvstore
+    if isinstance(kvstore, CachedDbKVStore):
+        source = image_source(name)
+        kvstore.cache.delete_many([
+            add_prefix(thumbnail_file(source, geometry_string, options).key)
+            for geometry_string, options in thumbnail_variants()
+        ])
+
+
+def generate_thumbnails(name):
+    for geometry_string, options in thumbnail_variants():
+        get_thumbnail(image_source(name), geometry_string, **options)
+    return name
+
+
+def thumbnails_missing(name):
+    source = image_source(name)
+    keys = [
+        add_prefix(thumbnail_file(source, geometry_string, options).key)
+        for geometry_string, options in thumbnail_variants()
+    ]
+    return len(get_many_raw(keys)) < len(keys)
+
+
+def release_image(name):
+    if not name or Post.objects.filter(image=name).exists():
+        return
+    storage = image_storage()
+    try:
+        storage.path(name)
+    except SuspiciousFileOperation:
+        return
+    delete_thumbnails(image_source(name))
+
+
+def unused_images(grace):
+    storage = image_storage()
+    directory = Post._meta.get_field('image').upload_to
+    try:
+        _, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    deadline = time.time() - grace
+    for filename in files:
+        name = os.path.join(directory, filename)
+        try:
+            modified = os.path.getmtime(storage.path(name))
+        except OSError:
+            continue
+        if modified < deadline and not Post.objects.filter(
+            image=name
+        ).exists():
+            yield name
+
+
+def collect_images(grace):
+    storage = image_storage()
+    removed = freed = 0
+    for name in unused_images(grace):
+        size = file_size(storage, name) or 0
+        release_image(name)
+        removed += 1
+        freed += size
+    return removed, freed
+
+
+def thumbnails_ready(name):
+    forget_thumbnails(name)
+    feeds = set()
+    for pk, author_id, group_id in Post.objects.filter(
+        image=name
+    ).values_list('pk', 'author_id', 'group_id'):
+        feeds.update(counts.post_feeds(author_id, group_id))
+        feeds.add(counts.feed_key('post', pk))
+    caching.invalidate_feeds(feeds)
+
+
+def file_size(storage, name):
+    try:
+        return storage.size(name)
+    except (OSError, SuspiciousFileOperation):
+        return None
+
+
+def size_row(label, sizes):
+    sizes = [size for size in sizes if size is not None]
+    total = sum(sizes)
+    average = total / len(sizes) if sizes else 0
+    return (
+        label, len(sizes), '%.1f' % (total / 1024), '%.1f' % (average / 1024)
+    )
+
+
+def storage_report():
+    names = list(Post.objects.exclude(image='').order_by().values_list(
+        'image', flat=True
+    ).distinct())
+    sources = [image_source(name) for name in names]
+    rows = [('вариант', 'файлов', 'всего, КБ', 'в среднем, КБ')]
+    rows.append(size_row('оригиналы', (
+        file_size(image_storage(), name)
+        for name in names
+    )))
+    for geometry_string, options in thumbnail_variants():
+        keys = [
+            add_prefix(thumbnail_file(source, geometry_string, options).key)
+            for source in sources
+        ]
+        values = get_many_raw(keys) if keys else {}
+        rows.append(size_row(
+            f'{geometry_string} {options["format"].lower()}',
+            (
+                file_size(default.storage, thumbnail.name)
+                for thumbnail in map(deserialize_image_file, values.values())
+            )
+        ))
+    return rows
+
+
+def detach_connections():
+    for connection in connections.all():
+        _inherited_connections.append(connection.connection)
+        connection.connection = None
+
+
+def process_pool(workers):
+    return ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context('fork'),
+        initializer=detach_connections
+    )
+
+
+def process_jobs(limit, workers=0):
+    """Разбирает пачку очереди; для неудачных заданий в ответе None."""
+    jobs = list(ThumbnailJob.objects.order_by('pk')[:limit])
+    names = [job.name for job in jobs]
+    if workers and names:
+        with process_pool(workers) as pool:
+            done = list(pool.map(safe_generate, names))
+    else:
+        done = list(map(safe_generate, names))
+    for job, name in zip(jobs, done):
+        if name is not None:
+            thumbnails_ready(name)
+        ThumbnailJob.objects.filter(pk=job.pk).delete()
+    return done
+
+
+def safe_generate(name):
+    try:
+        return generate_thumbnails(name)
+    except Exception:
+        logger.exception('Thumbnail generation failed for %s', name)
+        return None
+
+
+def queue_thumbnails(post):
+    name = post.image.name
+    if not name or not thumbnails_missing(name):
+        return
+
+    def submit():
+        if settings.THUMBNAIL_QUEUE:
+            ThumbnailJob.objects.get_or_create(name=name)
+        else:
+            thumbnails_ready(generate_thumbnails(name))
+    transaction.on_commit(submit)
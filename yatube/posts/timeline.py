@@ -0,0 +1,140 @@
+import heapq
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+
+from .models import Follow, Post, PulledAuthor, TimelineEntry, UserCounters
+from .querysets import feed_posts
+
+
+class MergedFeed:
+    """Упорядоченное k-путевое слияние нескольких лент постов.
+
+    Срез со смещением читает из каждой ленты offset + limit строк,
+    поэтому страницы такой ленты отдаются только по курсору.
+    """
+
+    ordered = True
+    cursor_only = True
+
+    def __init__(self, *querysets, reverse=True):
+        self.querysets = querysets
+        self.reverse = reverse
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def filter(self, *args, **kwargs):
+        return MergedFeed(
+            *(queryset.filter(*args, **kwargs) for queryset in self.querysets),
+            reverse=self.reverse
+        )
+
+    def order_by(self, *fields):
+        return MergedFeed(
+            *(queryset.order_by(*fields) for queryset in self.querysets),
+            reverse=fields[0].startswith('-')
+        )
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step:
+            raise TypeError('MergedFeed supports only plain slices.')
+        start, stop = index.start or 0, index.stop
+        merged = heapq.merge(
+            *(queryset[:stop] for queryset in self.querysets),
+            key=attrgetter('pub_date', 'pk'),
+            reverse=self.reverse
+        )
+        return list(islice(merged, start, stop))
+
+
+def insert_entries(entries):
+    batch_size = settings.TIMELINE_BATCH_SIZE
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, batch_size))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def is_pulled(author_id):
+    if PulledAuthor.objects.filter(author_id=author_id).exists():
+        return True
+    popular = UserCounters.objects.filter(
+        user_id=author_id,
+        followers_count__gte=settings.FEED_PULL_FOLLOWER_THRESHOLD
+    ).exists()
+    if not popular:
+        return False
+    PulledAuthor.objects.get_or_create(author_id=author_id)
+    return True
+
+
+def fan_out(post):
+    if is_pulled(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).distinct()
+    insert_entries(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in follower_ids.iterator()
+    )
+
+
+def backfill(follow):
+    if is_pulled(follow.author_id):
+        return
+    posts = Post.objects.filter(author_id=follow.author_id).order_by(
+        '-pub_date'
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL_LIMIT]
+    insert_entries(
+        TimelineEntry(
+            user_id=follow.user_id,
+            post_id=post_id,
+            author_id=follow.author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts
+    )
+
+
+def prune(follow):
+    still_following = Follow.objects.filter(
+        user_id=follow.user_id,
+        author_id=follow.author_id
+    ).exists()
+    if not still_following:
+        TimelineEntry.objects.filter(
+            user_id=follow.user_id,
+            author_id=follow.author_id
+        ).delete()
+
+
+def timeline_posts(user):
+    return Post.objects.filter(
+        timeline_entries__user=user
+    ).order_by('-timeline_entries__pub_date', '-timeline_entries__post')
+
+
+def followings_feed(user):
+    pulled_ids = list(PulledAuthor.objects.filter(
+        author__following__user=user
+    ).values_list('author_id', flat=True).distinct())
+    pushed = feed_posts(timeline_posts(user))
+    if not pulled_ids:
+        return pushed
+    pulled = (
+        feed_posts(Post.objects.filter(author_id=author_id)).order_by(
+            '-pub_date', '-id'
+        )
+        for author_id in pulled_ids
+    )
+    return MergedFeed(pushed.exclude(author_id__in=pulled_ids), *pulled)
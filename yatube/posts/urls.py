@@ -8,10 +8,22 @@ app_name = 'posts'
 urlpatterns = [
     path('', views.index, name='main_page'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('tags/<str:name>/', views.tag_posts, name='tag'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('search/', views.search, name='search'),
+    path(
+        'autocomplete/<str:kind>/',
+        views.autocomplete,
+        name='autocomplete'
+    ),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
@@ -1,9 +1,189 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+
 from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .caching import cached_page
+from .comments import prefetch_latest_comments
+from .counts import feed_count, remember_count
+from .thumbnails import prefetch_thumbnails
+
+ELLIPSIS = '…'
+
+
+def encode_cursor(obj, field='pub_date'):
+    raw = f'{getattr(obj, field).isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        value, pk = raw.decode().split('|')
+        value, pk = parse_datetime(value), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+def elided_page_range(page_obj, on_each_side=3, on_ends=2):
+    number = page_obj.number
+    num_pages = page_obj.paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2:
+        return list(range(1, num_pages + 1))
+    if number > (1 + on_each_side + on_ends) + 1:
+        pages = [*range(1, on_ends + 1), ELLIPSIS]
+        pages.extend(range(number - on_each_side, number + 1))
+    else:
+        pages = list(range(1, number + 1))
+    if number < (num_pages - on_each_side - on_ends) - 1:
+        pages.extend(range(number + 1, number + on_each_side + 1))
+        pages.append(ELLIPSIS)
+        pages.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        pages.extend(range(number + 1, num_pages + 1))
+    return pages
+
+
+class FeedPaginator(Paginator):
+    def __init__(self, object_list, per_page, feed):
+        super().__init__(object_list, per_page)
+        self.feed = feed
+
+    @cached_property
+    def count(self):
+        return feed_count(self.object_list, self.feed)
+
+    def correct_count(self, count):
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+        remember_count(self.feed, count)
+
+    def _get_page(self, object_list, number, paginator):
+        object_list = cached_page(
+            self.feed, f'page:{number}', lambda: list(object_list)
+        )
+        shown = (number - 1) * self.per_page + len(object_list)
+        if len(object_list) < self.per_page and shown != self.count:
+            if object_list or number == 1:
+                self.correct_count(shown)
+            else:
+                self.correct_count(self.object_list.count())
+                return self.page(self.num_pages)
+        return super()._get_page(object_list, number, paginator)
+
+
+class CursorPage(Page):
+    def __init__(self, object_list, paginator, previous_cursor, next_cursor):
+        super().__init__(object_list, None, paginator)
+        self.previous_cursor = previous_cursor
+        self.next_cursor = next_cursor
+
+    def __repr__(self):
+        return '<CursorPage of %s>' % len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (field, id): без COUNT(*) и OFFSET."""
+
+    cursor_mode = True
+
+    def __init__(self, object_list, per_page, feed=None, field='pub_date'):
+        super().__init__(object_list, per_page)
+        self.feed = feed
+        self.field = field
+
+    def newer(self, position):
+        value, pk = position
+        return (
+            Q(**{f'{self.field}__gt': value})
+            | Q(**{self.field: value, 'id__gt': pk})
+        )
+
+    def older(self, position):
+        value, pk = position
+        return (
+            Q(**{f'{self.field}__lt': value})
+            | Q(**{self.field: value, 'id__lt': pk})
+        )
+
+    def get_cursor_page(self, after=None, before=None):
+        if self.feed is None:
+            return self.build_cursor_page(after, before)
+        after = after if after and decode_cursor(after) else ''
+        before = before if before and decode_cursor(before) else ''
+
+        def build():
+            page = self.build_cursor_page(after, before)
+            return page.object_list, page.previous_cursor, page.next_cursor
+
+        object_list, previous_cursor, next_cursor = cached_page(
+            self.feed, f'after:{after}:before:{before}', build
+        )
+        return CursorPage(object_list, self, previous_cursor, next_cursor)
+
+    def build_cursor_page(self, after=None, before=None):
+        before_position = decode_cursor(before) if before else None
+        after_position = decode_cursor(after) if after else None
+        if before_position:
+            rows = list(
+                self.object_list.filter(self.newer(before_position)).order_by(
+                    self.field, 'id'
+                )[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            objects = self.object_list.order_by(f'-{self.field}', '-id')
+            if after_position:
+                objects = objects.filter(self.older(after_position))
+            rows = list(objects[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = after_position is not None
+        if not rows and (before_position or after_position):
+            return self.build_cursor_page()
+        return CursorPage(
+            rows,
+            self,
+            encode_cursor(rows[0], self.field) if has_previous else None,
+            encode_cursor(rows[-1], self.field) if has_next else None,
+        )
 
 
-def paginator(request, posts):
-    paginator_local_var = Paginator(posts, settings.ON_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator_local_var.get_page(page_number)
+def paginator(request, posts, feed=None, cursor=True):
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    cursor_only = getattr(posts, 'cursor_only', False)
+    if cursor and (
+        settings.CURSOR_PAGINATION or after or before or cursor_only
+    ):
+        page_obj = CursorPaginator(
+            posts, settings.ON_PAGE, feed
+        ).get_cursor_page(after, before)
+    else:
+        if feed is None:
+            paginator_local_var = Paginator(posts, settings.ON_PAGE)
+        else:
+            paginator_local_var = FeedPaginator(
+                posts, settings.ON_PAGE, feed
+            )
+        page_number = request.GET.get('page')
+        page_obj = paginator_local_var.get_page(page_number)
+    page_obj.object_list = list(page_obj.object_list)
+    prefetch_thumbnails(page_obj.object_list, 'card')
+    prefetch_latest_comments(page_obj.object_list)
     return page_obj
@@ -1,15 +1,85 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+from django.template.loader import render_to_string
 from django.shortcuts import get_object_or_404, redirect, render
 
+from .autocomplete import SOURCES, lookup
+from .counts import FEED_ALL, FEED_NAMES, feed_count, feed_key
+from .decorators import conditional_page, query_budget
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import paginator
+from .models import Comment, Follow, Group, Post, Tag, User
+from .querysets import feed_posts
+from .search import search_posts
+from .tags import normalize_tag
+from .thumbnails import prefetch_thumbnails, queue_thumbnails
+from .timeline import followings_feed
+from .utils import CursorPaginator, paginator
+
+
+def index_feeds():
+    return [FEED_ALL, FEED_NAMES], None
+
+
+def group_feeds(slug):
+    group = Group.objects.filter(slug=slug).values('pk', 'modified').first()
+    if group is None:
+        return None
+    return [feed_key('group', group['pk']), FEED_NAMES], group['modified']
+
+
+def profile_feeds(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return None
+    feeds = [
+        feed_key('author', author_id), feed_key('profile', author_id),
+        FEED_NAMES,
+    ]
+    return feeds, None
+
+
+def tag_feeds(name):
+    tag_id = Tag.objects.filter(name=normalize_tag(name)).values_list(
+        'pk', flat=True
+    ).first()
+    if tag_id is None:
+        return None
+    return [feed_key('tag', tag_id), FEED_NAMES], None
+
+
+def post_feeds(post_id):
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'modified'
+    ).first()
+    if post is None:
+        return None
+    feeds = [
+        feed_key('post', post_id), feed_key('author', post['author_id']),
+        FEED_NAMES,
+    ]
+    return feeds, post['modified']
 
 
+def comments_page(post_id, after=None):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).order_by('-created', '-id')
+    return CursorPaginator(
+        comments, settings.COMMENTS_ON_PAGE, field='created'
+    ).get_cursor_page(after)
+
+
+@query_budget(6)
+@conditional_page(index_feeds)
 def index(request):
     path = 'posts/index.html'
-    posts = Post.objects.order_by('-pub_date')
-    page_obj = paginator(request, posts)
+    posts = feed_posts().order_by('-pub_date')
+    page_obj = paginator(request, posts, FEED_ALL)
     main_page = True
     context = {
         'page_obj': page_obj,
@@ -18,11 +88,14 @@ def index(request):
     return render(request, path, context)
 
 
+@query_budget(8)
+@conditional_page(group_feeds)
 def group_posts(request, slug):
     path = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.order_by('-pub_date')
-    page_obj = paginator(request, posts)
+    posts = feed_posts(group.posts).order_by('-pub_date')
+    feed = feed_key('group', group.pk)
+    page_obj = paginator(request, posts, feed)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -30,12 +103,35 @@ def group_posts(request, slug):
     return render(request, path, context)
 
 
+@query_budget(8)
+@conditional_page(tag_feeds)
+def tag_posts(request, name):
+    path = 'posts/tag_list.html'
+    tag = get_object_or_404(Tag, name=normalize_tag(name))
+    posts = feed_posts(Post.objects.filter(post_tags__tag=tag)).order_by(
+        '-post_tags__pub_date', '-post_tags__post'
+    )
+    feed = feed_key('tag', tag.pk)
+    page_obj = paginator(request, posts, feed)
+    context = {
+        'tag': tag,
+        'page_obj': page_obj,
+    }
+    return render(request, path, context)
+
+
+@query_budget(10)
+@conditional_page(profile_feeds)
 def profile(request, username):
     path = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    num_of_posts = author.posts.all().count()
-    posts = author.posts.order_by('-pub_date')
-    page_obj = paginator(request, posts)
+    author = get_object_or_404(
+        User.objects.select_related('counters'),
+        username=username
+    )
+    feed = feed_key('author', author.pk)
+    num_of_posts = feed_count(author.posts.all(), feed)
+    posts = feed_posts(author.posts).order_by('-pub_date')
+    page_obj = paginator(request, posts, feed)
     following = (
         request.user.is_authenticated and Follow.objects.filter(
             user=request.user,
@@ -51,11 +147,17 @@ def profile(request, username):
     return render(request, path, context)
 
 
+@query_budget(6)
+@conditional_page(post_feeds)
 def post_detail(request, post_id):
     path = 'posts/post_detail.html'
     form = CommentForm()
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.order_by('-created')
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        pk=post_id
+    )
+    prefetch_thumbnails([post], 'detail')
+    comments = comments_page(post.pk)
     context = {
         'post': post,
         'form': form,
@@ -64,19 +166,66 @@ def post_detail(request, post_id):
     return render(request, path, context)
 
 
+@query_budget(5)
+@conditional_page(post_feeds)
+def post_comments(request, post_id):
+    path = 'includes/comments_list.html'
+    comments = comments_page(post_id, request.GET.get('after'))
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {
+        'comments': comments,
+        'appended': True,
+    }
+    return JsonResponse({
+        'html': render_to_string(path, context, request),
+        'next': comments.next_cursor,
+    })
+
+
+@query_budget(7)
+def search(request):
+    path = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = paginator(request, search_posts(query), cursor=False)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, path, context)
+
+
+@query_budget(4)
+def autocomplete(request, kind):
+    if kind not in SOURCES:
+        raise Http404
+    results = lookup(
+        kind, request.GET.get('q', '').strip(), settings.AUTOCOMPLETE_LIMIT
+    )
+    text = 'full_text' if request.user.is_authenticated else 'text'
+    return JsonResponse({'results': [
+        {'id': item['id'], 'text': item.get(text, item['text'])}
+        for item in results
+    ]})
+
+
+@query_budget(2)
 @login_required
 def post_create(request):
     path = 'posts/create_post.html'
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        queue_thumbnails(post)
         return redirect('posts:profile', request.user)
     context = {'form': form}
     return render(request, path, context)
 
 
+@query_budget(5)
 @login_required
 def post_edit(request, post_id):
     path = 'posts/create_post.html'
@@ -90,7 +239,9 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            queue_thumbnails(post)
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -111,12 +262,11 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(7)
 @login_required
 def followings_posts(request):
     path = 'posts/followings.html'
-    posts = Post.objects.filter(
-        author__following__user=request.user
-    ).select_related('author').order_by('-pub_date')
+    posts = followings_feed(request.user)
     page_obj = paginator(request, posts)
     followings = True
     context = {
@@ -0,0 +1,43 @@
+from django import forms
+from django.core.exceptions import ValidationError
+
+
+class AutocompleteSelect(forms.Select):
+    """Select, который выводит только выбранный вариант.
+
+    Остальные варианты подгружаются скриптом из JSON-эндпоинта.
+    """
+
+    class Media:
+        js = ('js/autocomplete.js',)
+
+    def __init__(self, url, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-autocomplete-url'] = self.url
+        return attrs
+
+    def selected_choices(self, value):
+        iterator = self.choices
+        choices = []
+        if iterator.field.empty_label is not None:
+            choices.append(('', iterator.field.empty_label))
+        selected = [item for item in value if item not in ('', None)]
+        if selected:
+            try:
+                objects = list(iterator.queryset.filter(pk__in=selected))
+            except (TypeError, ValueError, ValidationError):
+                objects = []
+            choices.extend(iterator.choice(obj) for obj in objects)
+        return choices
+
+    def optgroups(self, name, value, attrs=None):
+        choices = self.choices
+        self.choices = self.selected_choices(value)
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
@@ -0,0 +1,117 @@
+(function () {
+  'use strict';
+
+  var DELAY = 150;
+
+  function debounce(callback) {
+    var timer = null;
+    return function () {
+      var args = arguments;
+      clearTimeout(timer);
+      timer = setTimeout(function () { callback.apply(null, args); }, DELAY);
+    };
+  }
+
+  function fetchResults(url, query) {
+    return fetch(url + '?q=' + encodeURIComponent(query), {
+      headers: {'Accept': 'application/json'}
+    }).then(function (response) {
+      return response.ok ? response.json() : {results: []};
+    }).then(function (data) {
+      return data.results;
+    });
+  }
+
+  function setupSelect(select) {
+    var input = document.createElement('input');
+    input.type = 'search';
+    input.className = select.className;
+    input.placeholder = 'Начните вводить название группы';
+    input.setAttribute('list', select.id + '-choices');
+    var list = document.createElement('datalist');
+    list.id = select.id + '-choices';
+    var selected = select.options[select.selectedIndex];
+    if (selected && selected.value) {
+      input.value = selected.text;
+    }
+    var found = {};
+    input.addEventListener('input', debounce(function () {
+      var match = found[input.value];
+      select.innerHTML = '';
+      select.add(new Option('---------', ''));
+      if (match !== undefined) {
+        select.add(new Option(input.value, match, true, true));
+      }
+      if (match !== undefined || input.value === '') {
+        return;
+      }
+      fetchResults(select.dataset.autocompleteUrl, input.value)
+        .then(function (results) {
+          list.innerHTML = '';
+          found = {};
+          results.forEach(function (result) {
+            found[result.text] = result.id;
+            list.appendChild(new Option(result.text));
+          });
+        });
+    }));
+    select.hidden = true;
+    select.parentNode.insertBefore(input, select);
+    select.parentNode.insertBefore(list, select);
+  }
+
+  function setupMentions(textarea) {
+    var list = document.createElement('div');
+    list.className = 'list-group position-absolute';
+    list.hidden = true;
+    textarea.parentNode.style.position = 'relative';
+    textarea.parentNode.appendChild(list);
+
+    function currentMention() {
+      var before = textarea.value.slice(0, textarea.selectionStart);
+      var match = /(^|\s)@(\w*)$/.exec(before);
+      return match ? match[2] : null;
+    }
+
+    function insert(username) {
+      var end = textarea.selectionStart;
+      var start = textarea.value.lastIndexOf('@', end - 1) + 1;
+      textarea.value = textarea.value.slice(0, start) + username + ' ' +
+        textarea.value.slice(end);
+      textarea.selectionStart = textarea.selectionEnd =
+        start + username.length + 1;
+      list.hidden = true;
+      textarea.focus();
+    }
+
+    textarea.addEventListener('input', debounce(function () {
+      var query = currentMention();
+      if (!query) {
+        list.hidden = true;
+        return;
+      }
+      fetchResults(textarea.dataset.mentionUrl, query)
+        .then(function (results) {
+          list.innerHTML = '';
+          results.forEach(function (result) {
+            var item = document.createElement('button');
+            item.type = 'button';
+            item.className = 'list-group-item list-group-item-action';
+            item.textContent = result.text;
+            item.addEventListener('click', function () {
+              insert(result.id);
+            });
+            list.appendChild(item);
+          });
+          list.hidden = results.length === 0;
+        });
+    }));
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('select[data-autocomplete-url]')
+      .forEach(setupSelect);
+    document.querySelectorAll('textarea[data-mention-url]')
+      .forEach(setupMentions);
+  });
+})();
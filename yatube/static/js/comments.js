@@ -0,0 +1,24 @@
+(function () {
+  'use strict';
+
+  document.querySelectorAll('[data-comments-url]').forEach(function (button) {
+    var list = document.getElementById('comments');
+    button.addEventListener('click', function () {
+      button.disabled = true;
+      var url = button.dataset.commentsUrl + '?after=' +
+        encodeURIComponent(button.dataset.next);
+      fetch(url, {headers: {'Accept': 'application/json'}})
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          list.insertAdjacentHTML('beforeend', data.html);
+          if (data.next) {
+            button.dataset.next = data.next;
+            button.disabled = false;
+          } else {
+            button.remove();
+          }
+        })
+        .catch(function () { button.disabled = false; });
+    });
+  });
+})();
@@ -30,11 +30,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.metrics.MetricsMiddleware',
+    'posts.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -114,3 +118,47 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 ON_PAGE = 10
+CURSOR_PAGINATION = False
+FEED_COUNT_EXACT_LIMIT = 10000
+FEED_COUNT_TIMEOUT = 60 * 60 * 24
+TIMELINE_BATCH_SIZE = 1000
+TIMELINE_BACKFILL_LIMIT = 1000
+FEED_PULL_FOLLOWER_THRESHOLD = 10000
+FEED_CACHE_TIMEOUT = 60 * 60
+POST_CARD_TIMEOUT = 60 * 60 * 24
+ANONYMOUS_PAGE_CACHE_TIMEOUT = 60 * 10
+THUMBNAIL_ENGINE = 'posts.thumbnails.Engine'
+THUMBNAIL_BACKEND = 'posts.thumbnails.Backend'
+POST_IMAGE_SLOTS = {
+    'card': '960x339',
+    'detail': '960x400',
+}
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+THUMBNAIL_QUEUE = True
+THUMBNAIL_BATCH_SIZE = 50
+THUMBNAIL_MISS_TIMEOUT = 30
+MEDIA_GC_GRACE = 60 * 60 * 24
+IMAGE_PLACEHOLDER_SIZE = 16
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MAX_DECODED_PIXELS = 16_000_000
+IMAGE_MAX_SIDE = 2560
+IMAGE_UPLOAD_QUALITY = 85
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_SYNC_INTERVAL = 1.0
+AUTOCOMPLETE_CHANGES_RETENTION = 60 * 60 * 24
+COMMENTS_ON_PAGE = 20
+FEED_COMMENTS_PREVIEW = 3
+QUERY_BUDGET_CHECK = DEBUG
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILING_HEADER = 'HTTP_X_PROFILE'
+PROFILING_QUERY_PARAM = '_profile'
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+PROFILING_SAMPLE_INTERVAL = 0.001
+PROFILING_MAX_REPORTS = 200
+METRICS_ENABLED = True
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')